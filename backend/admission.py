@@ -0,0 +1,61 @@
+"""Admission control for the API.
+
+Each route class gets a ``ConcurrencyLimiter``: a fixed number of requests
+run at once, a bounded number wait for a slot, and anything beyond that (or
+anything that waits too long) is rejected immediately so the caller can
+answer 503 instead of piling more blocking Mongo calls onto the worker.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+import asyncio
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted"""
+
+
+class ConcurrencyLimiter:
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                raise Overloaded(self.name)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise Overloaded(self.name)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,122 @@
+"""Write-behind audit trail of admin changes.
+
+Admin endpoints only append an event to an in-memory queue; a background
+task inserts queued events in batches into the history collection. The
+queue is bounded: when Mongo is unreachable for long enough to fill it,
+the oldest events are dropped and counted rather than growing without
+limit. ``flush()`` is also called on shutdown.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+import asyncio
+import threading
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+
+def merge_history(pending: List[Dict[str, Any]], stored: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Newest first: pending events, then stored ones (newest first).
+
+    Read pending before stored: an event written in between then shows up
+    in both and is listed once, rather than in neither.
+    """
+    seen = {event["_id"] for event in pending}
+    events = pending[::-1] + [event for event in stored if event["_id"] not in seen]
+    return [{key: value for key, value in event.items() if key != "_id"} for event in events[:limit]]
+
+
+class AuditTrail:
+    def __init__(self, collection, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 2.0):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Deque[Dict[str, Any]] = deque(maxlen=max_queue)
+        # The batch being inserted, still listed by pending_for
+        self._inflight: List[Dict[str, Any]] = []
+        # record() runs on the event loop, flush() in the threadpool
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def record(self, report_id: str, action: str, actor: Optional[str], client: Optional[str],
+               changes: Dict[str, Any]) -> None:
+        event = {
+            # Assigned here so a retried batch cannot insert an event twice
+            "_id": ObjectId(),
+            "report_id": report_id,
+            "action": action,
+            "actor": actor,
+            "client": client,
+            "changes": changes,
+            "at": datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(event)
+            self.recorded += 1
+
+    def pending_for(self, report_id: str) -> List[Dict[str, Any]]:
+        """Events for a report not known to be written yet, oldest first"""
+        with self._lock:
+            events = self._inflight + list(self._queue)
+        return [event for event in events if event["report_id"] == report_id]
+
+    def _requeue(self, batch: List[Dict[str, Any]]) -> None:
+        """Put a failed batch back in front, oldest first. Events recorded
+        meanwhile may have used up the room; the oldest are dropped then."""
+        with self._lock:
+            overflow = len(batch) + len(self._queue) - self._queue.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+                batch = batch[overflow:]
+            self._queue.extendleft(reversed(batch))
+            self._inflight = []
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of events written"""
+        written = 0
+        while self._queue:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._inflight = batch
+            try:
+                self.collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys mean an earlier attempt already wrote those events
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    self._requeue(batch)
+                    self.errors += 1
+                    print(f"Error flushing audit trail: {e}")
+                    break
+            except PyMongoError as e:
+                # Retried on the next tick
+                self._requeue(batch)
+                self.errors += 1
+                print(f"Error flushing audit trail: {e}")
+                break
+            with self._lock:
+                self._inflight = []
+            written += len(batch)
+        self.flushed += written
+        return written
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._queue:
+                await run_in_threadpool(self.flush)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
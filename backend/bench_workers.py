@@ -0,0 +1,97 @@
+"""Throughput benchmark: single worker vs. multiple workers.
+
+    python bench_workers.py --workers 1 4 --clients 32 --duration 15
+
+Starts serve.py once per worker count against the configured MONGO_URL,
+drives GET /api/reports from several client processes with keep-alive
+sessions, and prints requests per second and latency percentiles.
+"""
+from multiprocessing import Pool
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/metrics", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def client_loop(args):
+    url, duration = args
+    session = requests.Session()
+    latencies = []
+    errors = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=10).status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    return latencies, errors
+
+
+def run(workers: int, clients: int, duration: float, port: int, path: str):
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+        cwd=HERE,
+        env={**os.environ, "ACCESS_LOG": "0"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_ready(base_url)
+        with Pool(clients) as pool:
+            results = pool.map(client_loop, [(base_url + path, duration)] * clients)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    latencies = sorted(l for result, _ in results for l in result)
+    errors = sum(e for _, e in results)
+    if not latencies:
+        print(f"workers={workers}: no successful requests ({errors} errors)")
+        return
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(
+        f"workers={workers:<3} {len(latencies) / duration:9.1f} req/s  "
+        f"p50={pct(0.50):6.1f}ms  p99={pct(0.99):6.1f}ms  errors={errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--path", default="/api/reports")
+    args = parser.parse_args()
+    for workers in args.workers:
+        run(workers, args.clients, args.duration, args.port, args.path)
+
+
+if __name__ == "__main__":
+    main()
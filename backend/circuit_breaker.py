@@ -0,0 +1,58 @@
+"""Circuit breaker around the Mongo data layer.
+
+After ``failure_threshold`` consecutive connection failures the breaker
+opens and reads stop going to Mongo at all, instead of each request
+waiting out the server selection timeout. It stays open until a probe
+succeeds; the server runs that probe in the background every
+``reset_timeout`` seconds and then revalidates its cached data.
+"""
+from typing import Any, Dict, Optional
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 5.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self.recoveries = 0
+        # Failures are recorded from threadpool workers as well as the loop
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def record_success(self) -> bool:
+        """Returns True if this success closed an open breaker"""
+        with self._lock:
+            self.failures = 0
+            if self.state == CLOSED:
+                return False
+            self.state, self.opened_at = CLOSED, None
+            self.recoveries += 1
+            return True
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == CLOSED and self.failures >= self.failure_threshold:
+                self.state, self.opened_at = OPEN, time.monotonic()
+                self.trips += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "open_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0,
+            "trips": self.trips,
+            "recoveries": self.recoveries,
+        }
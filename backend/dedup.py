@@ -0,0 +1,205 @@
+"""Near-duplicate report detection.
+
+    python dedup.py --reports 1000000
+
+Two reports are linked when they point to the same Power BI report (or the
+same URL), or when their names are similar: the estimated Jaccard
+similarity of the character trigrams of their ``name_key`` is at least
+``threshold``. Linked reports are merged into clusters with union-find.
+
+Similar names are found without comparing every pair. Each name gets a
+MinHash signature, computed with NumPy for thousands of names at a time,
+and the signature is cut into bands. Only reports that share a band
+(an LSH bucket) become candidates, and candidates are checked by
+signature agreement. Work grows linearly with the number of reports as
+long as buckets stay small; buckets larger than ``max_bucket`` (very
+common names) only link members with identical signatures.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from text_keys import name_key
+
+SAME_URL = "same_url"
+SIMILAR_NAME = "similar_name"
+
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def url_identity(report: Dict[str, Any]) -> Optional[str]:
+    """Power BI report id when the URL has one, otherwise the bare URL"""
+    if report.get("powerbi_report_id"):
+        return f"powerbi:{report['powerbi_report_id']}"
+    url = report.get("url")
+    if not url:
+        return None
+    parts = urlsplit(url.strip().lower())
+    return f"{parts.netloc}{parts.path.rstrip('/')}"
+
+
+class MinHashLSH:
+    def __init__(self, bands: int = 20, rows: int = 3, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        num_perm = bands * rows
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) mod 2**64, keeping the high
+        # 32 bits. Much cheaper than a prime modulus on NumPy arrays
+        self._a = rng.integers(1, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+        # Mixes a band's rows into a single 64-bit bucket key
+        self._mix = rng.integers(1, 1 << 63, size=rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+    def signatures(self, keys: List[str], chunk: int = 1000) -> np.ndarray:
+        """MinHash signatures of the trigrams of each (non-empty, ASCII) key"""
+        out = np.empty((len(keys), self.bands * self.rows), dtype=np.uint32)
+        for start in range(0, len(keys), chunk):
+            out[start:start + chunk] = self._chunk(keys[start:start + chunk])
+        return out
+
+    def _chunk(self, keys: List[str]) -> np.ndarray:
+        # Each key is followed by two NULs, so its last trigrams mark the
+        # end of the name; trigrams never span two names
+        lengths = np.fromiter((len(key) for key in keys), dtype=np.int64, count=len(keys))
+        data = np.frombuffer("".join(key + "\0\0" for key in keys).encode("ascii"), dtype=np.uint8).astype(np.uint64)
+        grams = (data[:-2] << np.uint64(16)) | (data[1:-1] << np.uint64(8)) | data[2:]
+        grams = (grams * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+        starts = np.concatenate(([0], np.cumsum(lengths + 2)[:-1]))
+        hashed = ((self._a * grams + self._b) >> np.uint64(32)).astype(np.uint32)
+        # Minimum over each key's own trigrams: segments [start, start + length)
+        bounds = np.stack([starts, starts + lengths], axis=1).ravel()
+        return np.minimum.reduceat(hashed, bounds[:-1], axis=1)[:, ::2].T
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """(bands, n) array of bucket keys"""
+        banded = signatures.reshape(len(signatures), self.bands, self.rows)
+        return (banded.astype(np.uint64) * self._mix).sum(axis=2, dtype=np.uint64).T
+
+
+def find_duplicates(reports: Iterable[Dict[str, Any]], threshold: float = 0.6, max_bucket: int = 100,
+                    lsh: Optional[MinHashLSH] = None) -> Dict[str, Any]:
+    """Clusters of reports that share a URL or have near-identical names"""
+    reports = list(reports)
+    lsh = lsh or MinHashLSH()
+    union = UnionFind(len(reports))
+    edges: List[Tuple[int, int, str]] = []
+
+    first_by_url: Dict[str, int] = {}
+    for i, report in enumerate(reports):
+        identity = url_identity(report)
+        if identity is None:
+            continue
+        first = first_by_url.setdefault(identity, i)
+        if first != i:
+            edges.append((first, i, SAME_URL))
+
+    keys = [report.get("name_key") or name_key(report["name"]) for report in reports]
+    indexed = np.array([i for i, key in enumerate(keys) if key], dtype=np.int64)
+    signatures = lsh.signatures([keys[i] for i in indexed])
+    oversized = 0
+    seen = set()
+    for band in lsh.band_keys(signatures):
+        order = np.argsort(band, kind="stable")
+        ordered = band[order]
+        run_starts = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1])))
+        run_ends = np.append(run_starts[1:], len(ordered))
+        for start, end in zip(run_starts[run_ends - run_starts > 1], run_ends[run_ends - run_starts > 1]):
+            members = order[start:end]
+            if len(members) > max_bucket:
+                oversized += 1
+                # Only exact signature matches inside very common buckets
+                first_by_sig: Dict[bytes, int] = {}
+                for member in members:
+                    first = first_by_sig.setdefault(signatures[member].tobytes(), member)
+                    if first != member and (first, member) not in seen:
+                        seen.add((first, member))
+                        edges.append((int(indexed[first]), int(indexed[member]), SIMILAR_NAME))
+                continue
+            block = signatures[members]
+            similarity = (block[:, None, :] == block[None, :, :]).mean(axis=2)
+            for a, b in zip(*np.nonzero(np.triu(similarity >= threshold, k=1))):
+                pair = (int(members[a]), int(members[b]))
+                if pair not in seen:
+                    seen.add(pair)
+                    edges.append((int(indexed[pair[0]]), int(indexed[pair[1]]), SIMILAR_NAME))
+
+    for a, b, _ in edges:
+        union.union(a, b)
+    clusters: Dict[int, Dict[str, Any]] = {}
+    for a, b, reason in edges:
+        cluster = clusters.setdefault(union.find(a), {"members": set(), "reasons": set()})
+        cluster["members"].update((a, b))
+        cluster["reasons"].add(reason)
+
+    result = [
+        {
+            "size": len(cluster["members"]),
+            "reasons": sorted(cluster["reasons"]),
+            "reports": [
+                {field: reports[i].get(field) for field in ("id", "name", "group", "url")}
+                for i in sorted(cluster["members"])
+            ],
+        }
+        for cluster in clusters.values()
+    ]
+    result.sort(key=lambda cluster: (-cluster["size"], cluster["reports"][0]["name"]))
+    return {
+        "clusters": result,
+        "total_reports": len(reports),
+        "duplicate_reports": sum(cluster["size"] for cluster in result),
+        "oversized_buckets": oversized,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    import uuid
+
+    parser = argparse.ArgumentParser(description="Time near-duplicate detection on synthetic reports")
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(20000)]
+    groups = ["DIRECCION COMERCIAL", "COMERCIALES", "COMPRAS", "RECURSOS HUMANOS", "GERENCIA", "SUCURSALES", "ALTEC"]
+    synthetic = []
+    for i in range(args.reports):
+        if synthetic and rng.random() < 0.01:
+            # Near duplicate or the same report listed under another group
+            original = rng.choice(synthetic)
+            if rng.random() < 0.5:
+                synthetic.append({**original, "id": str(uuid.uuid4()), "name": original["name"] + " v2"})
+            else:
+                synthetic.append({**original, "id": str(uuid.uuid4()), "group": rng.choice(groups)})
+            continue
+        synthetic.append({
+            "id": str(uuid.uuid4()),
+            "name": " ".join(rng.sample(words, 3)).title(),
+            "group": rng.choice(groups),
+            "url": f"https://app.powerbi.com/groups/{uuid.uuid4()}/reports/{uuid.uuid4()}",
+        })
+
+    start = time.perf_counter()
+    found = find_duplicates(synthetic)
+    print(f"{args.reports} reports: {time.perf_counter() - start:.1f}s, {len(found['clusters'])} clusters, "
+          f"{found['duplicate_reports']} reports in clusters, {found['oversized_buckets']} oversized buckets")
@@ -0,0 +1,93 @@
+"""Pre-serialized grouped view of the whole directory.
+
+The landing page needs every report organized by group plus the counts.
+``DirectorySnapshot`` builds that payload once, keeps the encoded JSON body
+and its ETag, and rebuilds it in the background when told the directory
+changed. A burst of admin writes leads to a single rebuild.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import asyncio
+import contextvars
+import hashlib
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+
+def group_reports(reports: Iterable[Dict[str, Any]], sort_key: Callable[[str], Any] = str.casefold) -> Dict[str, Any]:
+    """Groups in order, each with its reports sorted by name"""
+    by_group: Dict[str, List[Dict[str, Any]]] = {}
+    for report in reports:
+        by_group.setdefault(report["group"], []).append(report)
+    groups = []
+    for name in sorted(by_group, key=sort_key):
+        items = sorted(by_group[name], key=lambda report: sort_key(report["name"]))
+        groups.append({"name": name, "count": len(items), "reports": items})
+    return {
+        "total_reports": sum(group["count"] for group in groups),
+        "total_groups": len(groups),
+        "groups": groups,
+    }
+
+
+class DirectorySnapshot:
+    def __init__(self, loader: Callable[[], Iterable[Dict[str, Any]]], debounce: float = 0.2,
+                 sort_key: Callable[[str], Any] = str.casefold):
+        self._loader = loader
+        self._sort_key = sort_key
+        self.debounce = debounce
+        self.body: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.built_at: Optional[datetime] = None
+        self.builds = 0
+        self._task: Optional[asyncio.Future] = None
+        self._dirty = False
+
+    def build(self) -> None:
+        """Load the directory and replace the serialized snapshot.
+
+        The ETag covers the grouped reports only, so a rebuild that finds
+        the same content keeps the current body, its ``generated_at`` and
+        its ETag, and clients keep getting 304s.
+        """
+        built_at = datetime.utcnow()
+        payload = jsonable_encoder(group_reports(self._loader(), self._sort_key))
+        etag = f'"{hashlib.md5(JSONResponse(payload).body).hexdigest()}"'
+        if etag != self.etag:
+            payload["generated_at"] = jsonable_encoder(built_at)
+            self.body = JSONResponse({"success": True, "data": payload}).body
+            self.etag = etag
+        self.built_at = built_at
+        self.builds += 1
+
+    async def refresh(self) -> None:
+        await run_in_threadpool(self.build)
+
+    def invalidate(self) -> None:
+        """Schedule a background rebuild"""
+        if self._task is None or self._task.done():
+            # A fresh context: the rebuild must not inherit the deadline of
+            # the admin request that triggered it
+            self._task = contextvars.Context().run(asyncio.ensure_future, self._rebuild())
+        else:
+            self._dirty = True
+
+    async def _rebuild(self) -> None:
+        await asyncio.sleep(self.debounce)
+        while True:
+            self._dirty = False
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error rebuilding directory snapshot: {e}")
+            if not self._dirty:
+                return
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "builds": self.builds,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "bytes": len(self.body) if self.body else 0,
+        }
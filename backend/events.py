@@ -0,0 +1,118 @@
+"""In-process fan-out of directory change events to SSE subscribers.
+
+Every event is encoded once as an SSE frame and the same bytes are queued
+for every subscriber. A subscriber is only a bounded deque plus an
+``asyncio.Event``, so idle connections cost a few hundred bytes and no
+task wake-ups beyond the periodic keep-alive. A subscriber whose buffer
+fills up is evicted instead of letting it hold memory or slow down the
+publisher; it can reconnect with ``Last-Event-ID`` and replay what it
+missed from the recent history ring.
+
+Event ids are supplied by the publisher and need not arrive in order; the
+same change may be published more than once under the same ``key`` and is
+only sent the first time. The hub tracks the ``horizon``: every event
+with an id at or above it is still in the history ring. A client resuming
+from below the horizon gets a ``reset`` frame telling it to reload rather
+than a silently incomplete replay.
+"""
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, Optional, Set
+import asyncio
+import json
+
+
+class Subscriber:
+    __slots__ = ("buffer", "wakeup", "evicted")
+
+    def __init__(self):
+        self.buffer: Deque[bytes] = deque()
+        self.wakeup = asyncio.Event()
+        self.evicted = False
+
+
+class EventHub:
+    def __init__(self, buffer_size: int = 64, history_size: int = 256, max_subscribers: int = 10000,
+                 horizon: int = 0):
+        self.buffer_size = buffer_size
+        self.history_size = history_size
+        self.max_subscribers = max_subscribers
+        self.horizon = horizon
+        self._subscribers: Set[Subscriber] = set()
+        self._history: Deque[tuple] = deque()
+        self._keys: Set[Hashable] = set()
+        self.published = 0
+        self.resets = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def publish(self, event_id: int, event_type: str, data: Dict[str, Any], key: Hashable = None) -> bool:
+        """Send an event unless one with the same key is still in history"""
+        if key is not None:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        frame = f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode("utf-8")
+        self._history.append((event_id, key, frame))
+        if len(self._history) > self.history_size:
+            dropped_id, dropped_key, _ = self._history.popleft()
+            self._keys.discard(dropped_key)
+            self.horizon = max(self.horizon, dropped_id + 1)
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            if len(subscriber.buffer) >= self.buffer_size:
+                self._evict(subscriber)
+                continue
+            subscriber.buffer.append(frame)
+            subscriber.wakeup.set()
+        return True
+
+    def _evict(self, subscriber: Subscriber) -> None:
+        subscriber.evicted = True
+        subscriber.buffer.clear()
+        # Tell the client it fell behind and should reload the directory
+        subscriber.buffer.append(b"event: evicted\ndata: {}\n\n")
+        subscriber.wakeup.set()
+        self._subscribers.discard(subscriber)
+        self.evicted += 1
+
+    async def stream(self, since: Optional[int] = None, keepalive: float = 15.0) -> AsyncIterator[bytes]:
+        """Yield SSE frames until the client disconnects or is evicted,
+        starting with the history from event id ``since`` on"""
+        subscriber = Subscriber()
+        if since is not None:
+            if since < self.horizon:
+                # Part of what the client missed is gone; it must reload
+                subscriber.buffer.append(b"event: reset\ndata: {}\n\n")
+                self.resets += 1
+            else:
+                subscriber.buffer.extend(frame for event_id, _, frame in self._history if event_id >= since)
+        self._subscribers.add(subscriber)
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                while subscriber.buffer:
+                    yield subscriber.buffer.popleft()
+                if subscriber.evicted:
+                    return
+                subscriber.wakeup.clear()
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "evicted": self.evicted,
+            "resets": self.resets,
+            "horizon": self.horizon,
+        }
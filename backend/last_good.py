@@ -0,0 +1,89 @@
+"""Last known good copy of the directory, kept on local disk.
+
+Every successful full read of the directory from Mongo is written to a
+snapshot file (see ``snapshot.py``), at most once per ``min_interval`` and
+only when the report count or latest ``updated_at`` moved. When Mongo is
+unreachable, even right after a restart, the file is memory-mapped and
+loaded into a ``CompactReportStore`` that answers reads until Mongo is
+back.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import mmap
+import threading
+import time
+
+import bson
+
+from memory_store import CompactReportStore
+from snapshot import SnapshotError, read_blocks, read_header, write_snapshot
+
+
+def fingerprint(reports: List[Dict[str, Any]]) -> List[Any]:
+    return [len(reports), max((report.get("updated_at") or datetime.min for report in reports), default=None)]
+
+
+class LastKnownGood:
+    def __init__(self, path: str, min_interval: float = 60.0):
+        self.path = path
+        self.min_interval = min_interval
+        self.saved_at: Optional[datetime] = None
+        self._fingerprint: Optional[List[Any]] = None
+        self._saved_monotonic: Optional[float] = None
+        self._store: Optional[CompactReportStore] = None
+        self._lock = threading.Lock()
+        self.saves = 0
+        self.loads = 0
+        try:
+            with open(path, "rb") as f:
+                header = read_header(f)
+            self.saved_at, self._fingerprint = header["exported_at"], header.get("fingerprint")
+        except (OSError, SnapshotError, KeyError):
+            pass
+
+    def save(self, reports: List[Dict[str, Any]]) -> bool:
+        """Persist a full directory read; returns False when skipped"""
+        current = fingerprint(reports)
+        if current == self._fingerprint:
+            return False
+        if self._saved_monotonic is not None and time.monotonic() - self._saved_monotonic < self.min_interval:
+            return False
+        with self._lock:
+            try:
+                write_snapshot(self.path, (bson.encode(report) for report in reports), {"fingerprint": current})
+            except OSError as e:
+                print(f"Error saving last known good directory: {e}")
+                return False
+            self._fingerprint, self._saved_monotonic = current, time.monotonic()
+            self.saved_at = datetime.utcnow()
+            # Loaded again from the new file if Mongo goes away
+            self._store = None
+            self.saves += 1
+        return True
+
+    def reports(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            read_header(data)
+            for block in read_blocks(data):
+                yield from block
+
+    def store(self) -> Optional[CompactReportStore]:
+        """The saved directory as a queryable store, None if nothing was saved"""
+        with self._lock:
+            if self._store is None and self.saved_at is not None:
+                try:
+                    store = CompactReportStore.build(self.reports())
+                except (OSError, SnapshotError) as e:
+                    print(f"Error loading last known good directory: {e}")
+                    return None
+                self._store = store
+                self.loads += 1
+            return self._store
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "saved_at": self.saved_at.isoformat() if self.saved_at else None,
+            "saves": self.saves,
+            "loads": self.loads,
+            "loaded": self._store is not None,
+        }
@@ -0,0 +1,205 @@
+"""Background health checks of the stored Power BI URLs.
+
+``LinkChecker`` probes URLs with bounded overall concurrency, a minimum
+interval between requests to the same host, a per-request timeout and a
+result cache keyed by URL, so a URL listed under several groups, or
+re-checked within ``cache_ttl``, costs a single request. Errors are not
+cached so the next run retries them.
+
+An anonymous request to a Power BI link is redirected to the sign-in page
+whether or not the report exists, so redirects are not followed and are
+recorded as ``unverified``. When service principal credentials are
+configured (``PowerBIApi``), reports whose workspace and report ids are
+known are looked up in the Power BI REST API instead, which does tell a
+deleted or moved report apart. Only 404/410 mark a link as broken; other
+failures are recorded as errors so they can be retried.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
+import time
+
+import httpx
+
+OK = "ok"
+BROKEN = "broken"
+ERROR = "error"
+UNVERIFIED = "unverified"
+
+
+def classify(status_code: int) -> str:
+    if status_code in (404, 410):
+        return BROKEN
+    if 300 <= status_code < 400:
+        # Most likely the sign-in page, which says nothing about the report
+        return UNVERIFIED
+    if status_code < 300:
+        return OK
+    return ERROR
+
+
+def classify_api(status_code: int) -> str:
+    if status_code == 200:
+        return OK
+    if status_code == 404:
+        return BROKEN
+    if status_code in (401, 403):
+        # The service principal has no access to the workspace
+        return UNVERIFIED
+    return ERROR
+
+
+class PowerBIApi:
+    """Report lookups in the Power BI REST API with an app-only token.
+
+    Uses the client credentials flow of a service principal that has been
+    added to the workspaces it should verify.
+    """
+
+    SCOPE = "https://analysis.windows.net/powerbi/api/.default"
+
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str,
+                 api_base: str = "https://api.powerbi.com/v1.0/myorg",
+                 authority: str = "https://login.microsoftonline.com"):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_base = api_base.rstrip("/")
+        self.token_url = f"{authority.rstrip('/')}/{tenant_id}/oauth2/v2.0/token"
+        self._token: Optional[Tuple[str, float]] = None
+        self._token_lock = asyncio.Lock()
+
+    def report_url(self, workspace_id: Optional[str], report_id: Optional[str]) -> Optional[str]:
+        # "me" is the signed-in user's own workspace, which a service principal cannot see
+        if not workspace_id or not report_id or workspace_id == "me":
+            return None
+        return f"{self.api_base}/groups/{workspace_id}/reports/{report_id}"
+
+    def owns(self, url: str) -> bool:
+        return url.startswith(self.api_base + "/")
+
+    async def _access_token(self, client: httpx.AsyncClient) -> str:
+        async with self._token_lock:
+            if self._token is None or time.monotonic() >= self._token[1]:
+                response = await client.post(self.token_url, data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "scope": self.SCOPE,
+                })
+                response.raise_for_status()
+                body = response.json()
+                # Renewed a minute early so it cannot expire mid-request
+                self._token = (body["access_token"], time.monotonic() + int(body.get("expires_in", 3600)) - 60)
+            return self._token[0]
+
+    async def get(self, client: httpx.AsyncClient, url: str) -> httpx.Response:
+        token = await self._access_token(client)
+        return await client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host by at least 1 / rate seconds"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def wait(self, host: str) -> None:
+        if not self.interval:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            ready_at = self._next.get(host, now)
+            if ready_at > now:
+                await asyncio.sleep(ready_at - now)
+            self._next[host] = max(ready_at, now) + self.interval
+
+
+class LinkChecker:
+    def __init__(self, concurrency: int = 10, per_host_rate: float = 5.0, timeout: float = 10.0,
+                 cache_ttl: float = 3600.0, powerbi: Optional[PowerBIApi] = None):
+        self.concurrency = concurrency
+        self.powerbi = powerbi
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.rate_limiter = HostRateLimiter(per_host_rate)
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.requests = 0
+        self.cache_hits = 0
+
+    def target(self, report: Dict[str, Any]) -> str:
+        """What is checked for a report: its REST API entry when possible,
+        otherwise its stored URL"""
+        if self.powerbi is not None:
+            api_url = self.powerbi.report_url(report.get("workspace_id"), report.get("powerbi_report_id"))
+            if api_url is not None:
+                return api_url
+        return report["url"]
+
+    def cached(self, url: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(url)
+        if entry is not None and time.monotonic() - entry[0] < self.cache_ttl:
+            return entry[1]
+        return None
+
+    async def _probe(self, client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
+        self.requests += 1
+        try:
+            if self.powerbi is not None and self.powerbi.owns(url):
+                response = await self.powerbi.get(client, url)
+                status = classify_api(response.status_code)
+            else:
+                response = await client.head(url)
+                if response.status_code in (405, 501):
+                    response = await client.get(url)
+                status = classify(response.status_code)
+            result = {"link_status": status, "link_http_status": response.status_code}
+        except (httpx.HTTPError, KeyError, ValueError):
+            # Timeouts, refused connections, TLS and protocol errors, or an
+            # unusable token response
+            result = {"link_status": ERROR, "link_http_status": None}
+        result["link_checked_at"] = datetime.utcnow()
+        return result
+
+    async def check_all(self, urls: Iterable[str], client: Optional[httpx.AsyncClient] = None) -> Dict[str, Dict[str, Any]]:
+        """Check each distinct URL (or ``target``) once; returns url -> result"""
+        results: Dict[str, Dict[str, Any]] = {}
+        todo = []
+        for url in dict.fromkeys(urls):
+            hit = self.cached(url)
+            if hit is not None:
+                self.cache_hits += 1
+                results[url] = hit
+            else:
+                todo.append(url)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        owns_client = client is None
+        if owns_client:
+            client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=False)
+
+        async def check(url: str) -> None:
+            # Wait for the host's turn before taking one of the shared slots
+            await self.rate_limiter.wait(urlsplit(url).hostname or "")
+            async with semaphore:
+                result = await self._probe(client, url)
+            if result["link_status"] != ERROR:
+                self._cache[url] = (time.monotonic(), result)
+            results[url] = result
+
+        try:
+            await asyncio.gather(*(check(url) for url in todo))
+        finally:
+            if owns_client:
+                await client.aclose()
+        return results
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cached_urls": len(self._cache),
+        }
@@ -0,0 +1,302 @@
+"""Compact in-memory replica of the reports directory.
+
+Reports are kept column by column: names, URLs and Power BI report ids are
+packed as UTF-8 into one growing byte buffer each, groups and workspaces
+are small integers pointing into tables of interned strings, and timestamps are milliseconds packed into
+``array('q')``. A dict maps each report
+id to its slot. Deleted slots are left as holes, so iteration keeps the
+natural insertion order that Mongo returns. Once holes outnumber the live
+rows, ``compacted()`` copies the live rows into a new store for the owner
+to swap in; a store that readers may hold is never rearranged.
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+import sys
+
+from text_keys import name_key, search_words
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MS = timedelta(milliseconds=1)
+
+
+def _to_ms(value: Optional[datetime]) -> int:
+    if value is None:
+        return -1
+    return (value.replace(tzinfo=None) - EPOCH) // ONE_MS
+
+
+def _from_ms(value: int) -> Optional[datetime]:
+    if value < 0:
+        return None
+    return EPOCH + value * ONE_MS
+
+
+class _StringColumn:
+    """Strings stored back to back in a single UTF-8 buffer.
+
+    Each slot is one 64-bit word holding offset << 24 | length, so a slot is
+    replaced with a single assignment and readers on other threads never see
+    a half-updated span.
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._spans = array('Q')
+
+    def _encode(self, value: str) -> int:
+        encoded = value.encode('utf-8')
+        offset = len(self._data)
+        self._data += encoded
+        return offset << 24 | len(encoded)
+
+    def append(self, value: str) -> None:
+        self._spans.append(self._encode(value))
+
+    def set(self, slot: int, value: str) -> None:
+        # Overwritten bytes stay in the buffer until the next compaction
+        self._spans[slot] = self._encode(value)
+
+    def get(self, slot: int) -> str:
+        span = self._spans[slot]
+        offset = span >> 24
+        return self._data[offset:offset + (span & 0xFFFFFF)].decode('utf-8')
+
+    def take(self, slots: List[int]) -> "_StringColumn":
+        column = _StringColumn()
+        for slot in slots:
+            column.append(self.get(slot))
+        return column
+
+
+class CompactReportStore:
+    """Column-oriented store answering the read endpoints without Mongo"""
+
+    def __init__(self):
+        self._ids: List[Optional[str]] = []
+        self._names = _StringColumn()
+        self._name_keys = _StringColumn()
+        self._urls = _StringColumn()
+        self._powerbi_ids = _StringColumn()
+        self._group_idx = array('H')
+        self._workspace_idx = array('I')
+        self._created = array('q')
+        self._updated = array('q')
+        self._link_status = array('B')
+        self._link_http_status = array('h')
+        self._link_checked = array('q')
+        self._slots: Dict[str, int] = {}
+        self._group_names: List[str] = []
+        self._group_lookup: Dict[str, int] = {}
+        self._group_counts: List[int] = []
+        # Slot 0 stands for "no workspace" (URL without /groups/<id>/)
+        self._workspaces: List[Optional[str]] = [None]
+        self._workspace_lookup: Dict[Optional[str], int] = {None: 0}
+        self._holes = 0
+
+    # Index 0 stands for "never checked"
+    LINK_STATUSES = (None, "ok", "broken", "error", "unverified")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _intern_group(self, group: str) -> int:
+        idx = self._group_lookup.get(group)
+        if idx is None:
+            idx = len(self._group_names)
+            self._group_names.append(sys.intern(group))
+            self._group_lookup[group] = idx
+            self._group_counts.append(0)
+        return idx
+
+    def _intern_workspace(self, workspace: Optional[str]) -> int:
+        idx = self._workspace_lookup.get(workspace)
+        if idx is None:
+            idx = len(self._workspaces)
+            self._workspaces.append(sys.intern(workspace))
+            self._workspace_lookup[workspace] = idx
+        return idx
+
+    @classmethod
+    def build(cls, documents: Iterable[Dict[str, Any]]) -> "CompactReportStore":
+        """A new store holding the given documents.
+
+        Reloads build a fresh store and swap it in, so readers of the current
+        one never see it half-built.
+        """
+        store = cls()
+        for doc in documents:
+            store.upsert(doc)
+        return store
+
+    def upsert(self, doc: Dict[str, Any]) -> None:
+        """Insert a report or overwrite the slot it already occupies"""
+        group = self._intern_group(doc["group"])
+        workspace = self._intern_workspace(doc.get("workspace_id"))
+        slot = self._slots.get(doc["id"])
+        if slot is None:
+            self._slots[doc["id"]] = len(self._ids)
+            self._ids.append(doc["id"])
+            self._names.append(doc["name"])
+            self._name_keys.append(name_key(doc["name"]))
+            self._urls.append(doc["url"])
+            self._powerbi_ids.append(doc.get("powerbi_report_id") or "")
+            self._group_idx.append(group)
+            self._workspace_idx.append(workspace)
+            self._created.append(_to_ms(doc.get("created_at")))
+            self._updated.append(_to_ms(doc.get("updated_at")))
+            self._link_status.append(self.LINK_STATUSES.index(doc.get("link_status")))
+            self._link_http_status.append(doc.get("link_http_status") or -1)
+            self._link_checked.append(_to_ms(doc.get("link_checked_at")))
+        else:
+            self._group_counts[self._group_idx[slot]] -= 1
+            self._names.set(slot, doc["name"])
+            self._name_keys.set(slot, name_key(doc["name"]))
+            self._urls.set(slot, doc["url"])
+            self._powerbi_ids.set(slot, doc.get("powerbi_report_id") or "")
+            self._group_idx[slot] = group
+            self._workspace_idx[slot] = workspace
+            self._created[slot] = _to_ms(doc.get("created_at"))
+            self._updated[slot] = _to_ms(doc.get("updated_at"))
+            self._link_status[slot] = self.LINK_STATUSES.index(doc.get("link_status"))
+            self._link_http_status[slot] = doc.get("link_http_status") or -1
+            self._link_checked[slot] = _to_ms(doc.get("link_checked_at"))
+        self._group_counts[group] += 1
+
+    def remove(self, report_id: str) -> bool:
+        """Drop a report; returns False if it was not present"""
+        slot = self._slots.pop(report_id, None)
+        if slot is None:
+            return False
+        self._group_counts[self._group_idx[slot]] -= 1
+        self._ids[slot] = None
+        self._holes += 1
+        return True
+
+    def needs_compaction(self) -> bool:
+        return self._holes > len(self._slots)
+
+    def compacted(self) -> "CompactReportStore":
+        """A copy without the holes left by removed reports"""
+        live = [slot for slot in range(len(self._ids)) if self._ids[slot] is not None]
+        store = CompactReportStore()
+        store._ids = [self._ids[s] for s in live]
+        store._names = self._names.take(live)
+        store._name_keys = self._name_keys.take(live)
+        store._urls = self._urls.take(live)
+        store._powerbi_ids = self._powerbi_ids.take(live)
+        store._group_idx = array('H', (self._group_idx[s] for s in live))
+        store._workspace_idx = array('I', (self._workspace_idx[s] for s in live))
+        store._created = array('q', (self._created[s] for s in live))
+        store._updated = array('q', (self._updated[s] for s in live))
+        store._link_status = array('B', (self._link_status[s] for s in live))
+        store._link_http_status = array('h', (self._link_http_status[s] for s in live))
+        store._link_checked = array('q', (self._link_checked[s] for s in live))
+        store._slots = {report_id: slot for slot, report_id in enumerate(store._ids)}
+        store._group_names = list(self._group_names)
+        store._group_lookup = dict(self._group_lookup)
+        store._group_counts = list(self._group_counts)
+        store._workspaces = list(self._workspaces)
+        store._workspace_lookup = dict(self._workspace_lookup)
+        return store
+
+    def _row(self, slot: int) -> Dict[str, Any]:
+        return {
+            "id": self._ids[slot],
+            "name": self._names.get(slot),
+            "group": self._group_names[self._group_idx[slot]],
+            "url": self._urls.get(slot),
+            "workspace_id": self._workspaces[self._workspace_idx[slot]],
+            "powerbi_report_id": self._powerbi_ids.get(slot) or None,
+            "created_at": _from_ms(self._created[slot]),
+            "updated_at": _from_ms(self._updated[slot]),
+            "link_status": self.LINK_STATUSES[self._link_status[slot]],
+            "link_http_status": self._link_http_status[slot] if self._link_http_status[slot] >= 0 else None,
+            "link_checked_at": _from_ms(self._link_checked[slot]),
+        }
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        slot = self._slots.get(report_id)
+        return None if slot is None else self._row(slot)
+
+    def find(self, group: Optional[str] = None, search: Optional[str] = None,
+             workspace: Optional[str] = None, link_status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Same filtering as the Mongo query built in get_reports"""
+        group_idx = workspace_idx = None
+        link_idx = self.LINK_STATUSES.index(link_status) if link_status else None
+        if group:
+            group_idx = self._group_lookup.get(group)
+            if group_idx is None:
+                return []
+        if workspace:
+            workspace_idx = self._workspace_lookup.get(workspace)
+            if workspace_idx is None:
+                return []
+        words = search_words(search)
+        rows = []
+        for slot, report_id in enumerate(self._ids):
+            if report_id is None:
+                continue
+            if group_idx is not None and self._group_idx[slot] != group_idx:
+                continue
+            if workspace_idx is not None and self._workspace_idx[slot] != workspace_idx:
+                continue
+            if link_idx is not None and self._link_status[slot] != link_idx:
+                continue
+            if words is not None:
+                tokens = self._name_keys.get(slot).split()
+                if not all(any(token.startswith(word) for token in tokens) for word in words):
+                    continue
+            rows.append(self._row(slot))
+        return rows
+
+    def find_by_powerbi_report_id(self, powerbi_report_id: str) -> List[Dict[str, Any]]:
+        return [
+            self._row(slot) for slot, report_id in enumerate(self._ids)
+            if report_id is not None and self._powerbi_ids.get(slot) == powerbi_report_id
+        ]
+
+    def groups(self) -> List[str]:
+        return [name for name, count in zip(self._group_names, self._group_counts) if count > 0]
+
+    def group_stats(self) -> List[Dict[str, Any]]:
+        """Per-group counts shaped like the $group/$sort aggregation output"""
+        stats = [
+            {"_id": name, "count": count}
+            for name, count in zip(self._group_names, self._group_counts)
+            if count > 0
+        ]
+        stats.sort(key=lambda entry: -entry["count"])
+        return stats
+
+
+if __name__ == "__main__":
+    # Rough memory footprint per 100k synthetic reports
+    import tracemalloc
+    import uuid
+
+    groups = ["DIRECCION COMERCIAL", "COMERCIALES", "COMPRAS", "RECURSOS HUMANOS", "GERENCIA", "SUCURSALES", "ALTEC"]
+    now = datetime.utcnow()
+
+    def synthetic(count):
+        for i in range(count):
+            yield {
+                "id": str(uuid.uuid4()),
+                "name": f"Informe {i} {groups[i % len(groups)].title()}",
+                "group": groups[i % len(groups)],
+                "url": f"https://app.powerbi.com/groups/{uuid.uuid4()}/reports/{uuid.uuid4()}/ReportSection",
+                "created_at": now,
+                "updated_at": now,
+            }
+
+    tracemalloc.start()
+    as_dicts = list(synthetic(100_000))
+    dict_bytes, _ = tracemalloc.get_traced_memory()
+    del as_dicts
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = CompactReportStore.build(synthetic(100_000))
+    store_bytes, _ = tracemalloc.get_traced_memory()
+    print(f"list of dicts: {dict_bytes / 1024 / 1024:.1f} MiB per 100k reports")
+    print(f"compact store: {store_bytes / 1024 / 1024:.1f} MiB per 100k reports")
@@ -0,0 +1,129 @@
+"""Report open counters with batched persistence and an incremental top-K.
+
+Hits only touch in-memory counters. A background task periodically writes
+the accumulated increments with one bulk ``$inc`` and reloads the totals,
+which also folds in hits recorded by other worker processes.
+
+The top-K set is maintained on every hit: counts only grow, so a report
+outside the set can only enter it by overtaking the current minimum, which
+is checked in O(1) and replaced in O(K).
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import heapq
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+
+class OpenCounter:
+    def __init__(self, collection, k: int = 50, flush_interval: float = 10.0):
+        self.collection = collection
+        self.k = k
+        self.flush_interval = flush_interval
+        self._pending: Counter = Counter()
+        self._last_opened: Dict[str, datetime] = {}
+        self._totals: Dict[str, int] = {}
+        self._top: Set[str] = set()
+        self._min: Optional[Tuple[int, str]] = None
+        self.hits = 0
+        self.flushes = 0
+
+    def hit(self, report_id: str) -> None:
+        self._pending[report_id] += 1
+        self._last_opened[report_id] = datetime.utcnow()
+        self._totals[report_id] = self._totals.get(report_id, 0) + 1
+        self.hits += 1
+        self._promote(report_id)
+
+    def _promote(self, report_id: str) -> None:
+        count = self._totals[report_id]
+        if report_id in self._top:
+            if self._min is not None and self._min[1] == report_id:
+                self._min = min((self._totals[r], r) for r in self._top)
+        elif len(self._top) < self.k:
+            self._top.add(report_id)
+            if self._min is None or (count, report_id) < self._min:
+                self._min = (count, report_id)
+        elif count > self._min[0]:
+            self._top.discard(self._min[1])
+            self._top.add(report_id)
+            self._min = min((self._totals[r], r) for r in self._top)
+
+    def _rebuild_top(self) -> None:
+        best = heapq.nlargest(self.k, self._totals.items(), key=lambda item: (item[1], item[0]))
+        self._top = {report_id for report_id, _ in best}
+        self._min = min(((count, report_id) for report_id, count in best), default=None)
+
+    def top(self, limit: int) -> List[Tuple[str, int]]:
+        ranked = sorted(((report_id, self._totals[report_id]) for report_id in self._top),
+                        key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def remove(self, report_id: str) -> None:
+        self._pending.pop(report_id, None)
+        self._last_opened.pop(report_id, None)
+        self._totals.pop(report_id, None)
+        if report_id in self._top:
+            self._rebuild_top()
+
+    def flush(self) -> Optional[Dict[str, int]]:
+        """Persist pending increments and read back the totals.
+
+        Runs in the threadpool; the returned totals are applied with
+        ``apply`` on the event loop. Returns None if Mongo failed; the
+        increments are kept for the next flush.
+        """
+        pending, self._pending = self._pending, Counter()
+        last_opened, self._last_opened = self._last_opened, {}
+        now = datetime.utcnow()
+        if pending:
+            try:
+                self.collection.bulk_write([
+                    UpdateOne(
+                        {"id": report_id},
+                        {"$inc": {"count": count}, "$max": {"last_opened_at": last_opened.get(report_id, now)}},
+                        upsert=True
+                    )
+                    for report_id, count in pending.items()
+                ], ordered=False)
+                self.flushes += 1
+            except PyMongoError as e:
+                self._pending.update(pending)
+                for report_id, moment in last_opened.items():
+                    self._last_opened.setdefault(report_id, moment)
+                print(f"Error flushing report open counts: {e}")
+                return None
+        try:
+            return self.read_totals()
+        except PyMongoError as e:
+            print(f"Error reading report open counts: {e}")
+            return None
+
+    def read_totals(self) -> Dict[str, int]:
+        return {doc["id"]: doc["count"] for doc in self.collection.find({}, {"_id": 0, "id": 1, "count": 1})}
+
+    def apply(self, totals: Dict[str, int]) -> None:
+        # Hits recorded since the bulk write started are not in Mongo yet
+        for report_id, count in self._pending.items():
+            totals[report_id] = totals.get(report_id, 0) + count
+        self._totals = totals
+        self._rebuild_top()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            totals = await run_in_threadpool(self.flush)
+            if totals is not None:
+                self.apply(totals)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "pending": sum(self._pending.values()),
+            "flushes": self.flushes,
+            "tracked_reports": len(self._totals),
+        }
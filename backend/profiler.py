@@ -0,0 +1,124 @@
+"""On-demand sampling profiler with collapsed-stack output.
+
+While at least one session is active, a daemon thread wakes every
+``interval`` seconds and records the Python stack of every other thread
+from ``sys._current_frames()``. Threads idling in a threadpool queue are
+skipped. Each sample is added to every active session, so a time window
+and individually profiled requests can overlap. Nothing runs when no
+session is active.
+
+Sessions write the collapsed format read by flamegraph.pl and speedscope:
+one line per distinct stack, root first, frames separated by ``;``,
+followed by the sample count.
+
+Samples cover the whole process: a profiled request also shows whatever
+else the event loop and threadpool were doing at the time.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("_base.py", "result")}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    def __init__(self, label: str):
+        self.label = label
+        self.session_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.utcnow()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.path: Optional[str] = None
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir: str = "profiles", interval: float = 0.005, max_depth: int = 128):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_depth = max_depth
+        self._sessions: List[ProfileSession] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+
+    def start(self, label: str) -> ProfileSession:
+        session = ProfileSession(label)
+        with self._lock:
+            self._sessions.append(session)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session: ProfileSession) -> str:
+        """End a session and write its collapsed stacks; returns the file path"""
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = re.sub(r"[^A-Za-z0-9_.-]+", "_", session.label).strip("_")[:60]
+        # The session id keeps sessions started in the same second apart
+        name = f"{session.started_at:%Y%m%dT%H%M%S}-{os.getpid()}-{session.session_id}-{safe_label}.collapsed"
+        session.path = os.path.join(self.output_dir, name)
+        with open(session.path, "w", encoding="utf-8") as f:
+            f.write(session.collapsed())
+        return session.path
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions)
+                if not sessions:
+                    self._thread = None
+                    return
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                frames = []
+                while frame is not None and len(frames) < self.max_depth:
+                    frames.append(_frame_label(frame))
+                    frame = frame.f_back
+                frames.append(names.get(ident, str(ident)))
+                stacks.append(";".join(reversed(frames)))
+            for session in sessions:
+                session.stacks.update(stacks)
+                session.samples += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def files(self) -> List[str]:
+        try:
+            return sorted((name for name in os.listdir(self.output_dir) if name.endswith(".collapsed")), reverse=True)
+        except FileNotFoundError:
+            return []
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            active = [
+                {"label": session.label, "started_at": session.started_at.isoformat(), "samples": session.samples}
+                for session in self._sessions
+            ]
+        return {
+            "interval": self.interval,
+            "active": active,
+            "samples": self.samples,
+        }
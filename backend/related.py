@@ -0,0 +1,161 @@
+"""Related reports by TF-IDF similarity of names and groups.
+
+Each report is a sparse TF-IDF vector of the character trigrams of its
+``name_key``, plus the trigrams of its group at a lower weight,
+L2-normalized. The vectors are stored as an inverted index, where each
+trigram keeps typed arrays of (row, weight). Cosine similarity against
+every report is therefore a sparse matrix-vector product. NumPy does it
+with a single ``bincount`` over the query's posting lists, followed by
+``argpartition`` for the top K.
+
+Admin writes update the index in place: a new or edited report gets a
+new row and the old one is marked dead. Vectors are weighted with the IDF
+at the time they were added. A full rebuild, which also drops dead rows,
+corrects the drift and runs periodically and once dead rows pile up.
+"""
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+import math
+
+import numpy as np
+
+from text_keys import name_key
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class RelatedIndex:
+    def __init__(self, group_weight: float = 0.3, max_df_ratio: float = 0.5):
+        self.group_weight = group_weight
+        self.max_df_ratio = max_df_ratio
+        self._gram_ids: Dict[str, int] = {}
+        self._df = array("I")
+        self._posting_rows: List[array] = []
+        self._posting_weights: List[array] = []
+        self._ids: List[str] = []
+        self._group_names: List[str] = []
+        self._group_of: Dict[str, int] = {}
+        self._group_idx = array("H")
+        self._vectors: List[Tuple[array, array]] = []
+        self._alive = bytearray()
+        self._slots: Dict[str, int] = {}
+        self.dead = 0
+        self._size_hint = 0
+
+    @classmethod
+    def build(cls, reports: Iterable[Dict[str, Any]], **kwargs) -> "RelatedIndex":
+        reports = list(reports)
+        index = cls(**kwargs)
+        # Count document frequencies first so every vector uses the final IDF
+        for report in reports:
+            for gram in index._features(report):
+                index._df[index._gram_id(gram)] += 1
+        index._size_hint = len(reports)
+        for report in reports:
+            index._add(report, count_df=False)
+        index._size_hint = 0
+        return index
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, report_id: str) -> bool:
+        return report_id in self._slots
+
+    def _gram_id(self, gram: str) -> int:
+        gram_id = self._gram_ids.get(gram)
+        if gram_id is None:
+            gram_id = self._gram_ids[gram] = len(self._df)
+            self._df.append(0)
+            self._posting_rows.append(array("I"))
+            self._posting_weights.append(array("f"))
+        return gram_id
+
+    def _features(self, report: Dict[str, Any]) -> Counter:
+        features = Counter(trigrams(report.get("name_key") or name_key(report["name"])))
+        for gram in trigrams(name_key(report["group"])):
+            features["g" + gram] += self.group_weight
+        return features
+
+    def _add(self, report: Dict[str, Any], count_df: bool = True) -> None:
+        features = self._features(report)
+        if count_df:
+            for gram in features:
+                self._df[self._gram_id(gram)] += 1
+        total = max(len(self._slots) + 1, self._size_hint)
+        gram_ids, weights = array("I"), array("f")
+        for gram, tf in features.items():
+            gram_id = self._gram_id(gram)
+            gram_ids.append(gram_id)
+            weights.append(tf * (math.log((1 + total) / (1 + self._df[gram_id])) + 1))
+        norm = math.sqrt(sum(weight * weight for weight in weights)) or 1.0
+        weights = array("f", (weight / norm for weight in weights))
+
+        row = len(self._ids)
+        for gram_id, weight in zip(gram_ids, weights):
+            self._posting_rows[gram_id].append(row)
+            self._posting_weights[gram_id].append(weight)
+        group = self._group_of.get(report["group"])
+        if group is None:
+            group = self._group_of[report["group"]] = len(self._group_names)
+            self._group_names.append(report["group"])
+        self._ids.append(report["id"])
+        self._group_idx.append(group)
+        self._vectors.append((gram_ids, weights))
+        self._alive.append(1)
+        self._slots[report["id"]] = row
+
+    def upsert(self, report: Dict[str, Any]) -> None:
+        self.remove(report["id"])
+        self._add(report)
+
+    def remove(self, report_id: str) -> bool:
+        row = self._slots.pop(report_id, None)
+        if row is None:
+            return False
+        self._alive[row] = 0
+        for gram_id in self._vectors[row][0]:
+            self._df[gram_id] -= 1
+        self.dead += 1
+        return True
+
+    def needs_rebuild(self) -> bool:
+        return self.dead > max(1000, len(self._slots) // 4)
+
+    def related(self, report_id: str, k: int = 10, other_groups: bool = True) -> List[Tuple[str, float]]:
+        """Top k (id, cosine similarity) for a report, best first"""
+        row = self._slots.get(report_id)
+        if row is None:
+            return []
+        cutoff = max(100, self.max_df_ratio * len(self._slots))
+        rows, weights = [], []
+        for gram_id, weight in zip(*self._vectors[row]):
+            # Trigrams present in most reports say nothing about relatedness
+            if self._df[gram_id] > cutoff:
+                continue
+            rows.append(np.frombuffer(self._posting_rows[gram_id], dtype=np.uint32))
+            weights.append(np.frombuffer(self._posting_weights[gram_id], dtype=np.float32) * weight)
+        if not rows:
+            return []
+        scores = np.bincount(np.concatenate(rows), weights=np.concatenate(weights), minlength=len(self._ids))
+        scores[np.frombuffer(bytes(self._alive), dtype=np.uint8) == 0] = 0
+        scores[row] = 0
+        if other_groups:
+            scores[np.frombuffer(self._group_idx, dtype=np.uint16) == self._group_idx[row]] = 0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        ranked = sorted(candidates, key=lambda candidate: (-scores[candidate], self._ids[candidate]))
+        return [(self._ids[candidate], round(float(scores[candidate]), 4)) for candidate in ranked]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "reports": len(self._slots),
+            "rows": len(self._ids),
+            "dead_rows": self.dead,
+            "trigrams": len(self._gram_ids),
+        }
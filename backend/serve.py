@@ -0,0 +1,73 @@
+"""Production entry point for the Power BI Directory API.
+
+    python serve.py [--workers N] [--port 8001]
+
+The worker count defaults to WEB_CONCURRENCY or the number of CPU cores.
+uvloop and httptools are used when installed. The chosen worker count is
+exported as WEB_CONCURRENCY so each worker sizes its Mongo pool to its
+share of MONGO_POOL_BUDGET (see server.py). On SIGTERM/SIGINT uvicorn
+stops accepting connections and waits up to GRACEFUL_SHUTDOWN_SECONDS for
+in-flight requests to finish.
+
+With several workers, the one-time database setup (seeding an empty
+database, indexes, derived field backfill) runs here once before they
+start, and the workers are told to skip it through DATABASE_PREPARED.
+"""
+import argparse
+import importlib.util
+import os
+
+import uvicorn
+
+
+def default_workers() -> int:
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(1, cores)
+
+
+def fast_path(module: str, fallback: str) -> str:
+    """Use the optional C implementation when it is installed"""
+    return module if importlib.util.find_spec(module) is not None else fallback
+
+
+def prepare_database() -> None:
+    os.environ['DATABASE_PREPARED'] = '1'
+    import server
+
+    server.prepare_database()
+    server.client.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the Power BI Directory API")
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8001')))
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--graceful-timeout', type=int,
+                        default=int(os.environ.get('GRACEFUL_SHUTDOWN_SECONDS', '30')))
+    args = parser.parse_args(argv)
+
+    os.environ['WEB_CONCURRENCY'] = str(args.workers)
+    if args.workers > 1:
+        # A single worker runs in this process and prepares it on import
+        prepare_database()
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=fast_path('uvloop', 'asyncio'),
+        http=fast_path('httptools', 'h11'),
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        access_log=os.environ.get('ACCESS_LOG', '1').lower() in ('1', 'true', 'yes'),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,381 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.routing import APIRoute
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, validator
+from starlette.concurrency import run_in_threadpool
+from pymongo import MongoClient, UpdateOne
+import pymongo
+from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo.collation import Collation
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
 import os
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Dict, Any, Iterable, NamedTuple, Optional, Tuple, TypeVar
+from contextvars import Context, ContextVar
 import uuid
+import asyncio
+from collections import Counter
+import re
+import time
+import heapq
+import threading
+import hmac
+
+from memory_store import CompactReportStore
+from admission import ConcurrencyLimiter, Overloaded
+from coalescing import SingleFlight
+from events import EventHub
+from directory_snapshot import DirectorySnapshot
+from audit import AuditTrail, merge_history
+from popularity import OpenCounter
+from link_health import LinkChecker, PowerBIApi
+from dedup import find_duplicates
+from related import RelatedIndex
+from tracing import FileExporter, RingBufferExporter, Tracer
+from profiler import SamplingProfiler
+from snapshot import SnapshotError, restore_collection
+from circuit_breaker import CircuitBreaker
+from last_good import LastKnownGood
+from text_keys import name_key, name_tokens, search_filter, search_words, spanish_sort_key
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
-client = MongoClient(MONGO_URL)
+# Each worker process gets its share of the connection budget
+WEB_CONCURRENCY = max(1, int(os.environ.get('WEB_CONCURRENCY', '1')))
+MONGO_POOL_BUDGET = int(os.environ.get('MONGO_POOL_BUDGET', '100'))
+MONGO_POOL_SIZE = int(os.environ.get('MONGO_POOL_SIZE', str(max(4, MONGO_POOL_BUDGET // WEB_CONCURRENCY))))
+# Tracing: TRACE_SAMPLE_RATE of requests (0 = off) get spans per handler
+# phase and per Mongo command, exported to an in-process ring buffer or,
+# with TRACE_FILE, appended to a JSON-lines file. Requests whose traceparent
+# is sampled are always traced while tracing is on; TRACE_FOLLOW_PARENT
+# follows them even at rate 0
+TRACE_FILE = os.environ.get('TRACE_FILE')
+tracer = Tracer(
+    sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', '0')),
+    exporter=FileExporter(TRACE_FILE) if TRACE_FILE else RingBufferExporter(int(os.environ.get('TRACE_BUFFER_SIZE', '200'))),
+    follow_parent=os.environ.get('TRACE_FOLLOW_PARENT', '').lower() in ('1', 'true', 'yes'),
+)
+# Sampling profiler, idle until an admin starts a window or sends a request
+# with X-Profile set to PROFILE_TOKEN (header profiling is off without one)
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+MAX_PROFILE_SECONDS = float(os.environ.get('MAX_PROFILE_SECONDS', '300'))
+profiler = SamplingProfiler(
+    output_dir=os.environ.get('PROFILE_DIR', 'profiles'),
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+)
+# Kept well below REQUEST_DEADLINE_SECONDS so that during an outage a read
+# gives up on Mongo with time left to answer from the last known good copy
+MONGO_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SELECTION_TIMEOUT_MS', '2000'))
+client = MongoClient(
+    MONGO_URL,
+    maxPoolSize=MONGO_POOL_SIZE,
+    serverSelectionTimeoutMS=MONGO_SELECTION_TIMEOUT_MS,
+    event_listeners=[tracer.command_listener],
+)
 db = client['powerbi_directory']
 reports_collection = db['reports']
+# Ids of deleted reports, kept for SYNC_TOMBSTONE_TTL_DAYS so delta sync
+# clients can drop them from their local copy
+tombstones_collection = db['report_tombstones']
+# Write-behind history of admin changes, expired after AUDIT_TTL_DAYS
+history_collection = db['report_history']
+# Accumulated open counts per report, written in batches
+opens_collection = db['report_opens']
+# Fields returned by the API; name_key and name_tokens are internal to search
+PUBLIC_PROJECTION = {"_id": 0, "name_key": 0, "name_tokens": 0}
+
+# Read routing: the public GET endpoints may be served by secondaries, while
+# admin endpoints and read-your-write lookups always use reports_collection
+READ_PREFERENCES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '-1'))
+
+def build_read_preference(mode: str, max_staleness: int = -1):
+    """Build a pymongo read preference from its connection-string name"""
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown MONGO_READ_PREFERENCE '{mode}', expected one of {sorted(READ_PREFERENCES)}")
+    if mode == 'primary':
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+reports_read_collection = reports_collection.with_options(
+    read_preference=build_read_preference(MONGO_READ_PREFERENCE, MONGO_MAX_STALENESS_SECONDS)
+)
+
+# After an admin write, that client's reads stay on the primary for a short
+# window so the admin panel refresh sees its own change. The response to the
+# write carries the end of the window in READ_PRIMARY_HEADER and the client
+# sends it back, so the pin holds on whichever worker serves the read and
+# leaves every other client's reads on the secondaries.
+PRIMARY_READ_AFTER_WRITE_SECONDS = float(os.environ.get('PRIMARY_READ_AFTER_WRITE_SECONDS', '5'))
+READ_PRIMARY_HEADER = "X-Read-Primary-Until"
+read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+
+def mark_write(request: Request):
+    if PRIMARY_READ_AFTER_WRITE_SECONDS > 0:
+        request.state.read_primary_until = int((time.time() + PRIMARY_READ_AFTER_WRITE_SECONDS) * 1000)
+
+def read_collection():
+    """Collection used by the read-only endpoints"""
+    if read_primary.get():
+        return reports_collection
+    return reports_read_collection
+
+# Optional in-memory serving mode: reads are answered from a compact replica,
+# admin writes go to Mongo first and are then applied to the replica
+IN_MEMORY_DIRECTORY = os.environ.get('IN_MEMORY_DIRECTORY', '').lower() in ('1', 'true', 'yes')
+MEMORY_REFRESH_SECONDS = float(os.environ.get('MEMORY_REFRESH_SECONDS', '30'))
+memory_store = CompactReportStore() if IN_MEMORY_DIRECTORY else None
+# Reloads build a new store in the threadpool and swap it in. Admin changes
+# made meanwhile are queued here and replayed on the new store before the
+# swap, under memory_store_lock
+memory_store_changes: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+memory_store_lock = threading.Lock()
+# One reload at a time: the link check and the refresh loop may overlap
+memory_reload_lock = threading.Lock()
 
 # FastAPI app
 app = FastAPI(title="Power BI Directory API", description="API for managing Power BI reports directory")
 
+class TracedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, tracer.wrap_endpoint(endpoint), **kwargs)
+
+app.router.route_class = TracedRoute
+
+# Admission control: per route class concurrency limit and bounded wait queue.
+# Requests that cannot be queued are answered 503 with Retry-After.
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', '1'))
+admission_limiters = {
+    "read": ConcurrencyLimiter(
+        "read",
+        limit=int(os.environ.get('READ_CONCURRENCY_LIMIT', '32')),
+        queue_size=int(os.environ.get('READ_QUEUE_SIZE', '128')),
+        queue_timeout=float(os.environ.get('READ_QUEUE_TIMEOUT', '2')),
+    ),
+    "admin": ConcurrencyLimiter(
+        "admin",
+        limit=int(os.environ.get('ADMIN_CONCURRENCY_LIMIT', '4')),
+        queue_size=int(os.environ.get('ADMIN_QUEUE_SIZE', '16')),
+        queue_timeout=float(os.environ.get('ADMIN_QUEUE_TIMEOUT', '5')),
+    ),
+}
+# The event stream is long-lived and must not hold a read slot
+ADMISSION_EXEMPT_PATHS = {"/api/metrics", "/api/events"}
+
+def route_class(path: str) -> Optional[str]:
+    """Admission class of a request path, None for unlimited paths"""
+    if path in ADMISSION_EXEMPT_PATHS or not path.startswith("/api/"):
+        return None
+    if path.startswith("/api/admin/"):
+        return "admin"
+    return "read"
+
+# Registered before CORS so shed responses still carry CORS headers
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    limiter = admission_limiters.get(route_class(request.url.path))
+    if limiter is None:
+        return await call_next(request)
+    try:
+        async with limiter.slot():
+            return await call_next(request)
+    except Overloaded:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Servidor sobrecargado, inténtelo de nuevo más tarde"},
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+
+# Mongo outages: after MONGO_BREAKER_FAILURES consecutive connection failures
+# reads skip Mongo and are answered from the last known good directory,
+# saved on local disk, until a background ping succeeds again
+mongo_breaker = CircuitBreaker(
+    "mongo",
+    failure_threshold=int(os.environ.get('MONGO_BREAKER_FAILURES', '3')),
+    reset_timeout=float(os.environ.get('MONGO_BREAKER_RESET_SECONDS', '5')),
+)
+last_good = LastKnownGood(
+    os.environ.get('LAST_GOOD_PATH', 'last_good_directory.snap'),
+    min_interval=float(os.environ.get('LAST_GOOD_SAVE_SECONDS', '60')),
+)
+# Per request slot set when the response was built from stale data
+stale_response: ContextVar[Optional[Dict[str, Any]]] = ContextVar("stale_response", default=None)
+# Set while the in-memory replica holds the last known good copy
+memory_store_stale_at: Optional[datetime] = None
+
+def mark_stale(saved_at: Optional[datetime]) -> None:
+    marker = stale_response.get()
+    if marker is not None and saved_at is not None:
+        marker["saved_at"] = saved_at
+
+def stale_store() -> CompactReportStore:
+    store = last_good.store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Base de datos no disponible",
+                            headers={"Retry-After": str(int(mongo_breaker.reset_timeout))})
+    mark_stale(last_good.saved_at)
+    return store
+
+def directory_store() -> Optional[CompactReportStore]:
+    """Store that answers directory reads, or None to query Mongo"""
+    if memory_store is not None:
+        mark_stale(memory_store_stale_at)
+        return memory_store
+    if mongo_breaker.is_open:
+        return stale_store()
+    return None
+
+T = TypeVar("T")
+
+def read_directory(query: Callable[[Optional[CompactReportStore]], T]) -> T:
+    """Run query(store), where store=None means Mongo.
+
+    A connection failure counts against the breaker and the query is
+    answered from the last known good copy instead.
+    """
+    store = directory_store()
+    if store is None:
+        try:
+            result = query(None)
+        except ConnectionFailure as e:
+            # Server selection and network errors, including ones cut short
+            # by the request deadline. A slow query on a healthy server
+            # fails with ExecutionTimeout instead and does not land here
+            mongo_breaker.record_failure()
+            print(f"Mongo unreachable, serving last known good directory: {e}")
+            store = stale_store()
+        else:
+            mongo_breaker.record_success()
+            return result
+    return query(store)
+
+@app.middleware("http")
+async def staleness_headers(request: Request, call_next):
+    marker: Dict[str, Any] = {}
+    stale_response.set(marker)
+    response = await call_next(request)
+    if marker:
+        age = int((datetime.utcnow() - marker["saved_at"]).total_seconds())
+        response.headers["X-Data-Stale"] = "true"
+        response.headers["X-Data-Saved-At"] = marker["saved_at"].isoformat() + "Z"
+        response.headers["Warning"] = f'110 - "Response is stale, saved {age}s ago"'
+    return response
+
+# Request deadlines: every Mongo operation a request makes runs under
+# pymongo.timeout(), so its remaining budget is sent as maxTimeMS and also
+# bounds server selection, pool checkout and socket reads. Per route
+# overrides come from ROUTE_DEADLINES, e.g. "/api/reports=2,/api/stats=1";
+# the longest matching path prefix wins.
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', '5'))
+ADMIN_REQUEST_DEADLINE_SECONDS = float(os.environ.get('ADMIN_REQUEST_DEADLINE_SECONDS', '15'))
+
+def parse_route_deadlines(value: str) -> Dict[str, float]:
+    deadlines = {}
+    for item in value.split(","):
+        path, sep, seconds = item.partition("=")
+        if sep and path.strip():
+            deadlines[path.strip()] = float(seconds)
+    return deadlines
+
+ROUTE_DEADLINES = parse_route_deadlines(os.environ.get('ROUTE_DEADLINES', ''))
+# Deadline of the current request as (route, expires at on the monotonic clock)
+request_deadline: ContextVar[Optional[Tuple[str, float]]] = ContextVar("request_deadline", default=None)
+deadline_timeouts: Counter = Counter()
+
+def deadline_for(path: str) -> Tuple[str, Optional[float]]:
+    """Route key and deadline in seconds for a request path"""
+    matches = [prefix for prefix in ROUTE_DEADLINES if path.startswith(prefix)]
+    if matches:
+        prefix = max(matches, key=len)
+        return prefix, ROUTE_DEADLINES[prefix]
+    kind = route_class(path)
+    if kind == "admin":
+        return kind, ADMIN_REQUEST_DEADLINE_SECONDS
+    if kind == "read":
+        return kind, REQUEST_DEADLINE_SECONDS
+    return "other", None
+
+def database_error(e: PyMongoError) -> HTTPException:
+    """HTTP error for a failed Mongo operation: 504 when it ran out of time"""
+    if e.timeout:
+        deadline = request_deadline.get()
+        deadline_timeouts[deadline[0] if deadline else "other"] += 1
+        return HTTPException(status_code=504, detail="La consulta superó el tiempo máximo de respuesta")
+    return HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def detached(coro):
+    """Schedule a background task outside the current request's context,
+    so it does not inherit the request deadline"""
+    return Context().run(asyncio.ensure_future, coro)
+
+@app.middleware("http")
+async def request_deadlines(request: Request, call_next):
+    route, seconds = deadline_for(request.url.path)
+    if not seconds or request.url.path in ADMISSION_EXEMPT_PATHS:
+        return await call_next(request)
+    request_deadline.set((route, time.monotonic() + seconds))
+    with pymongo.timeout(seconds):
+        return await call_next(request)
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    until = request.headers.get(READ_PRIMARY_HEADER, "")
+    if until.isdigit():
+        now = time.time() * 1000
+        # Values past the longest possible window are not ours; ignore them
+        if now < int(until) <= now + PRIMARY_READ_AFTER_WRITE_SECONDS * 1000:
+            read_primary.set(True)
+    response = await call_next(request)
+    written = getattr(request.state, "read_primary_until", None)
+    if written is not None:
+        response.headers[READ_PRIMARY_HEADER] = str(written)
+    return response
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-[0-9a-f]{16}-([0-9a-f]{2})$")
+
+# Registered last so the root span also covers admission and deadlines
+@app.middleware("http")
+async def request_tracing(request: Request, call_next):
+    # A W3C traceparent with the sampled flag continues the caller's trace
+    parent = TRACEPARENT.match(request.headers.get("traceparent", ""))
+    sampled = parent is not None and bool(int(parent.group(2), 16) & 1)
+    root = tracer.start_trace(f"{request.method} {request.url.path}", parent.group(1) if parent else None, sampled)
+    if root is None:
+        return await call_next(request)
+    response = await call_next(request)
+    trace = root.trace
+    if trace.handler_end is not None:
+        tracer.record("serialize", trace.handler_end, time.perf_counter())
+    tracer.finish_trace(root, status=response.status_code)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    response.headers["traceparent"] = f"00-{trace.trace_id}-{root.span_id}-01"
+    return response
+
+# Registered after tracing so the profile covers the whole request
+@app.middleware("http")
+async def request_profiling(request: Request, call_next):
+    token = request.headers.get("X-Profile")
+    # Compared as bytes: compare_digest rejects non-ASCII str
+    if not PROFILE_TOKEN or token is None or not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        return await call_next(request)
+    session = profiler.start(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    finally:
+        path = await run_in_threadpool(profiler.stop, session)
+    response.headers["X-Profile-File"] = os.path.basename(path)
+    response.headers["X-Profile-Samples"] = str(session.samples)
+    return response
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +383,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read back by the admin panel, see read_your_writes
+    expose_headers=[READ_PRIMARY_HEADER],
 )
 
 # Data models
@@ -398,60 +759,812 @@ reports_data = [
     }
 ]
 
+# Snapshot written by `python snapshot.py export` to seed an empty database
+# instead of the built-in report list
+SEED_SNAPSHOT = os.environ.get('SEED_SNAPSHOT')
+
 def init_database():
     """Initialize the database with sample data if empty"""
     try:
-        if reports_collection.count_documents({}) == 0:
+        if reports_collection.count_documents({}) > 0:
+            print("Database already contains reports")
+        elif SEED_SNAPSHOT:
+            restored, header = restore_collection(reports_collection, SEED_SNAPSHOT)
+            print(f"Restored {restored} reports from snapshot exported at {header['exported_at']}")
+        else:
             print("Initializing database with reports...")
             reports_collection.insert_many(reports_data)
             print(f"Inserted {len(reports_data)} reports into the database")
+    except (PyMongoError, OSError, SnapshotError) as e:
+        print(f"Error initializing database: {e}")
+
+POWERBI_URL_IDS = re.compile(r"/groups/([^/?#]+)/reports/([^/?#]+)", re.IGNORECASE)
+
+def parse_powerbi_ids(url: str) -> Dict[str, Optional[str]]:
+    """Workspace and report identifiers embedded in a Power BI URL"""
+    match = POWERBI_URL_IDS.search(url or "")
+    if not match:
+        return {"workspace_id": None, "powerbi_report_id": None}
+    return {"workspace_id": match.group(1).lower(), "powerbi_report_id": match.group(2).lower()}
+
+def backfill_derived_fields():
+    """Store name_key, name_tokens and the Power BI identifiers on reports written before they existed"""
+    try:
+        missing = reports_collection.find(
+            {"$or": [
+                {"workspace_id": {"$exists": False}},
+                {"name_key": {"$exists": False}},
+                {"name_tokens": {"$exists": False}},
+            ]},
+            {"name": 1, "url": 1}
+        )
+        updates = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {
+                "name_key": name_key(doc.get("name", "")),
+                "name_tokens": name_tokens(doc.get("name", "")),
+                **parse_powerbi_ids(doc.get("url"))
+            }})
+            for doc in missing
+        ]
+        if updates:
+            reports_collection.bulk_write(updates, ordered=False)
+            print(f"Backfilled derived fields on {len(updates)} reports")
+    except PyMongoError as e:
+        print(f"Error backfilling derived fields: {e}")
+
+SYNC_TOMBSTONE_TTL_DAYS = int(os.environ.get('SYNC_TOMBSTONE_TTL_DAYS', '30'))
+# Writes stamp updated_at before they commit, so tokens trail the clock a bit
+SYNC_SAFETY_MS = int(os.environ.get('SYNC_SAFETY_MS', '5000'))
+
+def sync_millis(moment: datetime) -> int:
+    """Milliseconds since the epoch: sync tokens and event ids"""
+    return (moment - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+
+SPANISH = Collation(locale="es")
+AUDIT_TTL_DAYS = int(os.environ.get('AUDIT_TTL_DAYS', '365'))
+
+def ensure_indexes():
+    """Create the indexes the API relies on"""
+    try:
+        reports_collection.create_index("id", unique=True)
+        # Sorted listings come straight off these; queries must use the same collation
+        reports_collection.create_index([("name", 1)], name="name_es", collation=SPANISH)
+        reports_collection.create_index([("group", 1), ("name", 1)], name="group_name_es", collation=SPANISH)
+        # Search: one anchored prefix per word, bounded on the multikey tokens
+        reports_collection.create_index([("group", 1), ("name_tokens", 1)])
+        reports_collection.create_index("name_tokens")
+        reports_collection.create_index([("group", 1), ("updated_at", -1)])
+        reports_collection.create_index("link_status", sparse=True)
+        reports_collection.create_index("updated_at")
+        reports_collection.create_index("workspace_id")
+        reports_collection.create_index("powerbi_report_id")
+        tombstones_collection.create_index("id", unique=True)
+        history_collection.create_index([("report_id", 1), ("at", -1)])
+        opens_collection.create_index("id", unique=True)
+        history_collection.create_index("at", expireAfterSeconds=AUDIT_TTL_DAYS * 24 * 3600)
+        tombstones_collection.create_index(
+            "deleted_at", expireAfterSeconds=SYNC_TOMBSTONE_TTL_DAYS * 24 * 3600
+        )
+    except PyMongoError as e:
+        print(f"Error creating indexes: {e}")
+
+def prepare_database():
+    """One-time setup: seed an empty database, create indexes, backfill derived fields"""
+    init_database()
+    ensure_indexes()
+    backfill_derived_fields()
+
+# serve.py prepares the database once before starting its workers, which
+# would otherwise all see an empty database and each insert the seed reports
+if os.environ.get('DATABASE_PREPARED', '').lower() not in ('1', 'true', 'yes'):
+    prepare_database()
+
+# Change notifications pushed to /api/events subscribers. The worker that
+# handled an admin write publishes it right away; every worker also polls
+# updated_at and the tombstones, so writes made elsewhere reach its
+# subscribers too. Event ids are the change's sync token, the same in every
+# worker and across restarts, and history only covers what this worker has
+# polled since it started.
+event_feed_cursor = datetime.utcnow() - timedelta(milliseconds=SYNC_SAFETY_MS)
+event_hub = EventHub(
+    buffer_size=int(os.environ.get('EVENTS_BUFFER_SIZE', '64')),
+    history_size=int(os.environ.get('EVENTS_HISTORY_SIZE', '256')),
+    max_subscribers=int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', '10000')),
+    horizon=sync_millis(event_feed_cursor),
+)
+EVENTS_KEEPALIVE_SECONDS = float(os.environ.get('EVENTS_KEEPALIVE_SECONDS', '15'))
+EVENTS_POLL_SECONDS = float(os.environ.get('EVENTS_POLL_SECONDS', '1'))
+
+def publish_change(action: str, report: Dict[str, Any], changed_at: datetime) -> None:
+    if action == "deleted":
+        payload = {"id": report["id"], "name": report.get("name"), "group": report.get("group")}
+    else:
+        payload = jsonable_encoder(report)
+    event_id = sync_millis(changed_at)
+    # The poll sees this worker's own writes again; the key skips them
+    event_hub.publish(event_id, action, payload, key=(report["id"], event_id))
+
+def read_change_feed() -> Tuple[datetime, List[Tuple[str, Dict[str, Any], datetime]]]:
+    """Changes stamped since the feed cursor, oldest first, and the next
+    cursor; runs in the threadpool"""
+    # A write may commit up to SYNC_SAFETY_MS after the stamp it carries
+    cursor = datetime.utcnow() - timedelta(milliseconds=SYNC_SAFETY_MS)
+    changes = [
+        ("created" if doc.get("created_at") == doc["updated_at"] else "updated", doc, doc["updated_at"])
+        for doc in reports_collection.find({"updated_at": {"$gte": event_feed_cursor}}, PUBLIC_PROJECTION)
+    ]
+    changes.extend(
+        ("deleted", doc, doc["deleted_at"])
+        for doc in tombstones_collection.find({"deleted_at": {"$gte": event_feed_cursor}}, {"_id": 0})
+    )
+    changes.sort(key=lambda change: change[2])
+    return cursor, changes
+
+async def event_feed_loop():
+    global event_feed_cursor
+    while True:
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+        try:
+            cursor, changes = await run_in_threadpool(read_change_feed)
+        except PyMongoError:
+            # Retried from the same cursor on the next poll
+            continue
+        for action, report, changed_at in changes:
+            publish_change(action, report, changed_at)
+        event_feed_cursor = cursor
+
+@app.on_event("startup")
+async def start_event_feed():
+    if EVENTS_POLL_SECONDS > 0:
+        asyncio.create_task(event_feed_loop())
+
+audit_trail = AuditTrail(
+    history_collection,
+    max_queue=int(os.environ.get('AUDIT_MAX_QUEUE', '10000')),
+    batch_size=int(os.environ.get('AUDIT_BATCH_SIZE', '500')),
+    flush_interval=float(os.environ.get('AUDIT_FLUSH_SECONDS', '2')),
+)
+AUDITED_FIELDS = ("name", "group", "url")
+
+def request_actor(request: Request) -> Tuple[str, Optional[str]]:
+    """Who made an admin request, as reported by the admin panel, and from where"""
+    actor = request.headers.get("x-admin-user", "").strip() or "anonymous"
+    return actor, request.client.host if request.client else None
+
+def record_change(action: str, report: Dict[str, Any], request: Optional[Request] = None,
+                  before: Optional[Dict[str, Any]] = None):
+    """Apply a successful admin write to the in-process views of the directory"""
+    global memory_store
+    if request is not None:
+        if action == "created":
+            changes = {field: [None, report.get(field)] for field in AUDITED_FIELDS}
+        elif action == "deleted":
+            changes = {field: [report.get(field), None] for field in AUDITED_FIELDS}
         else:
-            print("Database already contains reports")
+            changes = {
+                field: [before.get(field), report.get(field)]
+                for field in AUDITED_FIELDS if before.get(field) != report.get(field)
+            }
+        audit_trail.record(report["id"], action, *request_actor(request), changes)
+    if memory_store is not None:
+        with memory_store_lock:
+            memory_store = apply_memory_change(memory_store, action, report)
+            if memory_store_changes is not None:
+                memory_store_changes.append((action, report))
+    if action == "deleted":
+        related_index.remove(report["id"])
+    else:
+        related_index.upsert(report)
+    if related_index.needs_rebuild():
+        schedule_related_rebuild()
+    publish_change(action, report, report["deleted_at"] if action == "deleted" else report["updated_at"])
+    directory_snapshot.invalidate()
+
+def apply_memory_change(store: CompactReportStore, action: str, report: Dict[str, Any]) -> CompactReportStore:
+    """Apply one admin change; returns the store to use from now on, a
+    compacted copy once removals have left too many holes"""
+    if action == "deleted":
+        store.remove(report["id"])
+        if store.needs_compaction():
+            # Threadpool readers keep iterating the old store undisturbed
+            return store.compacted()
+    else:
+        store.upsert(report)
+    return store
+
+def replace_memory_store(load: Callable[[], Iterable[Dict[str, Any]]], stale_at: Optional[datetime]) -> None:
+    """Build a new in-memory replica from load() and swap it in; runs in
+    the threadpool"""
+    global memory_store, memory_store_changes, memory_store_stale_at
+    with memory_reload_lock:
+        # Started before the read so no admin change can fall in between
+        with memory_store_lock:
+            memory_store_changes = []
+        try:
+            store = CompactReportStore.build(load())
+            with memory_store_lock:
+                for action, report in memory_store_changes:
+                    store = apply_memory_change(store, action, report)
+                memory_store, memory_store_stale_at = store, stale_at
+        finally:
+            memory_store_changes = None
+
+def refresh_memory_store():
+    """Reload the in-memory replica from Mongo"""
+    if memory_store is not None:
+        reports: List[Dict[str, Any]] = []
+
+        def load():
+            reports.extend(reports_read_collection.find({}, PUBLIC_PROJECTION))
+            return reports
+
+        replace_memory_store(load, None)
+        last_good.save(reports)
+
+async def memory_refresh_loop():
+    # Picks up writes made by other workers or processes
+    while True:
+        await asyncio.sleep(MEMORY_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(refresh_memory_store)
+        except PyMongoError as e:
+            print(f"Error refreshing in-memory directory: {e}")
+
+@app.on_event("startup")
+async def load_memory_store():
+    if memory_store is None:
+        return
+    try:
+        await run_in_threadpool(refresh_memory_store)
+        print(f"Loaded {len(memory_store)} reports into memory")
     except PyMongoError as e:
-        print(f"Error initializing database: {e}")
+        print(f"Error loading in-memory directory: {e}")
+        if last_good.saved_at is not None:
+            await run_in_threadpool(replace_memory_store, last_good.reports, last_good.saved_at)
+            print(f"Loaded {len(memory_store)} reports saved at {last_good.saved_at} into memory")
+    if MEMORY_REFRESH_SECONDS > 0:
+        asyncio.create_task(memory_refresh_loop())
+
+# When the directory snapshot was last built from the last known good copy
+directory_stale_at: Optional[datetime] = None
+
+def load_directory() -> List[Dict[str, Any]]:
+    global directory_stale_at
 
-# Initialize database on startup
-init_database()
+    def query(store):
+        if store is not None:
+            return store.find()
+        reports = list(read_collection().find({}, PUBLIC_PROJECTION))
+        last_good.save(reports)
+        return reports
+
+    marker: Dict[str, Any] = {}
+    token = stale_response.set(marker)
+    try:
+        reports = read_directory(query)
+    finally:
+        stale_response.reset(token)
+    directory_stale_at = marker.get("saved_at")
+    return reports
+
+# Grouped landing page payload, rebuilt in the background after admin writes
+directory_snapshot = DirectorySnapshot(load_directory, sort_key=spanish_sort_key)
+DIRECTORY_SNAPSHOT_REFRESH_SECONDS = float(os.environ.get('DIRECTORY_SNAPSHOT_REFRESH_SECONDS', '30'))
+
+async def directory_snapshot_loop():
+    # Picks up writes made by other workers or processes
+    while True:
+        await asyncio.sleep(DIRECTORY_SNAPSHOT_REFRESH_SECONDS)
+        directory_snapshot.invalidate()
+
+@app.on_event("startup")
+async def build_directory_snapshot():
+    try:
+        await directory_snapshot.refresh()
+    except (PyMongoError, HTTPException) as e:
+        # HTTPException: Mongo is down and there is no last known good copy yet
+        print(f"Error building directory snapshot: {e}")
+    if DIRECTORY_SNAPSHOT_REFRESH_SECONDS > 0:
+        asyncio.create_task(directory_snapshot_loop())
+
+# TF-IDF index behind /api/reports/{id}/related, updated on admin writes and
+# rebuilt from the directory every RELATED_REBUILD_SECONDS
+related_index = RelatedIndex()
+RELATED_REBUILD_SECONDS = float(os.environ.get('RELATED_REBUILD_SECONDS', '600'))
+MAX_RELATED_LIMIT = int(os.environ.get('MAX_RELATED_LIMIT', '50'))
+related_rebuild: Optional[asyncio.Future] = None
+
+async def rebuild_related_index():
+    global related_index
+    try:
+        related_index = await run_in_threadpool(lambda: RelatedIndex.build(load_directory()))
+    except (PyMongoError, HTTPException) as e:
+        print(f"Error building related reports index: {e}")
+
+def schedule_related_rebuild():
+    global related_rebuild
+    if related_rebuild is None or related_rebuild.done():
+        related_rebuild = detached(rebuild_related_index())
+
+async def related_rebuild_loop():
+    while True:
+        await asyncio.sleep(RELATED_REBUILD_SECONDS)
+        schedule_related_rebuild()
+
+@app.on_event("startup")
+async def build_related_index():
+    await rebuild_related_index()
+    if RELATED_REBUILD_SECONDS > 0:
+        asyncio.create_task(related_rebuild_loop())
+
+async def mongo_recovery_loop():
+    # While the breaker is open, probe Mongo and revalidate once it answers
+    while True:
+        await asyncio.sleep(mongo_breaker.reset_timeout)
+        if not mongo_breaker.is_open:
+            continue
+        try:
+            await run_in_threadpool(client.admin.command, "ping")
+        except PyMongoError:
+            continue
+        if mongo_breaker.record_success():
+            print("Mongo reachable again, revalidating the directory")
+            directory_snapshot.invalidate()
+
+@app.on_event("startup")
+async def start_mongo_recovery():
+    asyncio.create_task(mongo_recovery_loop())
 
 @app.get("/")
 async def root():
     return {"message": "Power BI Directory API is running"}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Runtime metrics for monitoring"""
+    return {
+        "success": True,
+        "data": {
+            "admission": {name: limiter.metrics() for name, limiter in admission_limiters.items()},
+            "coalescing": report_queries.metrics(),
+            "events": event_hub.metrics(),
+            "directory_snapshot": directory_snapshot.metrics(),
+            "audit": audit_trail.metrics(),
+            "opens": open_counter.metrics(),
+            "link_check": link_checker.metrics(),
+            "mongo_breaker": mongo_breaker.metrics(),
+            "last_good": last_good.metrics(),
+            "deadline_timeouts": dict(deadline_timeouts),
+            "related": related_index.metrics(),
+            "tracing": tracer.metrics(),
+            "profiler": profiler.metrics()
+        }
+    }
+
+REPORT_FIELDS = (
+    "id", "name", "group", "url", "workspace_id", "powerbi_report_id", "created_at", "updated_at",
+    "link_status", "link_http_status", "link_checked_at"
+)
+LINK_STATUSES = ("ok", "broken", "error", "unverified")
+
+class ReportQuery(NamedTuple):
+    """Normalized get_reports parameters; also the coalescing key"""
+    group: Optional[str] = None
+    search: Optional[str] = None
+    workspace: Optional[str] = None
+    fields: Optional[Tuple[str, ...]] = None
+    facets: bool = False
+    sort: Optional[str] = None
+    link_status: Optional[str] = None
+
+# sort= values: Mongo sort spec, whether it compares strings (needs the
+# Spanish collation to match the indexes), and the in-memory sort key
+REPORT_SORTS = {
+    "name": ([("name", 1)], True, lambda r: spanish_sort_key(r["name"])),
+    "group": ([("group", 1), ("name", 1)], True, lambda r: (spanish_sort_key(r["group"]), spanish_sort_key(r["name"]))),
+    "updated_at": ([("updated_at", -1)], False, lambda r: r["updated_at"] or datetime.min),
+}
+
+def parse_sort(sort: Optional[str]) -> Optional[str]:
+    if not sort:
+        return None
+    if sort.lstrip("-") not in REPORT_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort, expected one of {', '.join(REPORT_SORTS)}")
+    return sort
+
+# Identical concurrent directory queries share one backend query and one
+# serialized response body
+report_queries = SingleFlight()
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Normalize the comma separated fields parameter"""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(REPORT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in REPORT_FIELDS if f in requested)
+
+def query_reports(q: ReportQuery) -> bytes:
+    """Run a directory query and return the serialized response body"""
+    def run(store):
+        facets = None
+        if store is not None:
+            if q.facets:
+                # Facet counts ignore the group filter so every badge is meaningful
+                matches = store.find(None, q.search, q.workspace, q.link_status)
+                counts = Counter(report["group"] for report in matches)
+                facets = [{"_id": group, "count": count} for group, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+                reports = [report for report in matches if not q.group or report["group"] == q.group]
+            else:
+                reports = store.find(q.group, q.search, q.workspace, q.link_status)
+            if q.sort:
+                spec, _, key = REPORT_SORTS[q.sort.lstrip("-")]
+                reversed_order = (spec[0][1] < 0) != q.sort.startswith("-")
+                reports.sort(key=key, reverse=reversed_order)
+            if q.fields:
+                reports = [{f: report[f] for f in q.fields} for report in reports]
+        else:
+            # Build query
+            query = {}
+            search = search_filter(q.search)
+            if search:
+                query.update(search)
+            if q.workspace:
+                query["workspace_id"] = q.workspace
+            if q.link_status:
+                query["link_status"] = q.link_status
+
+            projection = PUBLIC_PROJECTION
+            if q.fields:
+                projection = {"_id": 0, **{f: 1 for f in q.fields}}
+
+            sort_spec, collation = None, None
+            if q.sort:
+                spec, uses_collation, _ = REPORT_SORTS[q.sort.lstrip("-")]
+                sign = -1 if q.sort.startswith("-") else 1
+                sort_spec = [(field, direction * sign) for field, direction in spec]
+                collation = SPANISH if uses_collation else None
+
+            if q.facets:
+                # Only the per-group counts are aggregated: a $facet holding the
+                # reports would hit the 16 MB document limit and could not use
+                # the sort indexes. Counts ignore the group filter
+                facets = list(read_collection().aggregate([
+                    {"$match": query},
+                    {"$group": {"_id": "$group", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1, "_id": 1}}
+                ]))
+            if q.group:
+                query["group"] = q.group
+            # Get reports from database
+            cursor = read_collection().find(query, projection)
+            if sort_spec:
+                cursor = cursor.sort(sort_spec)
+                if collation:
+                    cursor = cursor.collation(collation)
+            reports = list(cursor)
+
+        return reports, facets
+
+    with tracer.span("query"):
+        reports, facets = read_directory(run)
+    payload = {
+        "success": True,
+        "data": reports,
+        "total": len(reports)
+    }
+    if facets is not None:
+        payload["facets"] = {"groups": facets}
+    with tracer.span("encode", reports=len(reports)):
+        return JSONResponse(jsonable_encoder(payload)).body
+
 @app.get("/api/reports")
-async def get_reports(group: Optional[str] = None, search: Optional[str] = None):
-    """Get all reports with optional filtering by group and search term"""
+async def get_reports(group: Optional[str] = None, search: Optional[str] = None,
+                      workspace: Optional[str] = None, fields: Optional[str] = None, facets: bool = False,
+                      sort: Optional[str] = None, link_status: Optional[str] = None):
+    """Get all reports with optional filtering by group, search term and Power BI workspace.
+
+    With facets=true the response also carries per-group counts for the
+    search and workspace filters, ignoring the group filter. sort= takes
+    name, group or updated_at (newest first); prefix with - to reverse.
+    link_status=broken lists reports whose URL failed the last health check.
+    """
+    if link_status and link_status not in LINK_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid link_status, expected one of {', '.join(LINK_STATUSES)}")
+    # Searches that fold to the same words ("Nómina región", "region  NOMINA")
+    # run the same filter, so they share one coalescing key
+    words = search_words(search)
+    q = ReportQuery(
+        group=group if group and group != "ALL" else None,
+        search=" ".join(sorted(words)) if words else search or None,
+        workspace=workspace.strip().lower() if workspace and workspace.strip() else None,
+        fields=parse_fields(fields),
+        facets=facets,
+        sort=parse_sort(sort),
+        link_status=link_status or None,
+    )
+    try:
+        async def build():
+            # Runs as its own task shared by coalesced requests, so staleness
+            # is returned with the body rather than marked on one request
+            marker: Dict[str, Any] = {}
+            stale_response.set(marker)
+            if memory_store is not None:
+                body = query_reports(q)
+            else:
+                body = await run_in_threadpool(query_reports, q)
+            return body, marker.get("saved_at")
+
+        # Primary-pinned requests must not share a secondary's answer
+        body, saved_at = await report_queries.run((q, read_primary.get()), build)
+        mark_stale(saved_at)
+        return Response(content=body, media_type="application/json")
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/api/directory")
+async def get_directory(request: Request):
+    """All reports organized by group, with counts, for the landing page"""
+    try:
+        if directory_snapshot.body is None:
+            await directory_snapshot.refresh()
+        mark_stale(directory_stale_at)
+        headers = {"ETag": directory_snapshot.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == directory_snapshot.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=directory_snapshot.body, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """Server-Sent Events stream of report created/updated/deleted events.
+
+    Event ids are sync tokens. On reconnect, events from SYNC_SAFETY_MS
+    before Last-Event-ID on are replayed, so a few may arrive twice; if
+    they are no longer all in history a `reset` event is sent instead and
+    the client should catch up with /api/reports/changes?since=<id>."""
+    if event_hub.full():
+        raise HTTPException(status_code=503, detail="Too many event subscribers")
+    last_event_id = request.headers.get("last-event-id", "")
+    since = int(last_event_id) - SYNC_SAFETY_MS if last_event_id.isdigit() else None
+    return StreamingResponse(
+        event_hub.stream(since, keepalive=EVENTS_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/groups")
+async def get_groups():
+    """Get all unique groups/areas"""
+    try:
+        groups = read_directory(lambda store: store.groups() if store is not None else read_collection().distinct("group"))
+        return {
+            "success": True,
+            "data": sorted(groups, key=spanish_sort_key)
+        }
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+open_counter = OpenCounter(
+    opens_collection,
+    k=int(os.environ.get('POPULAR_TOP_K', '50')),
+    flush_interval=float(os.environ.get('OPEN_COUNTS_FLUSH_SECONDS', '10')),
+)
+
+@app.on_event("startup")
+async def start_open_counter():
+    try:
+        open_counter.apply(await run_in_threadpool(open_counter.read_totals))
+    except PyMongoError as e:
+        print(f"Error loading report open counts: {e}")
+    asyncio.create_task(open_counter.run())
+
+@app.post("/api/reports/{report_id}/open")
+async def track_report_open(report_id: str):
+    """Count one open of a report; persisted in the background"""
+    if len(report_id) > 64:
+        raise HTTPException(status_code=400, detail="Invalid report id")
+    # Unknown ids would otherwise push real reports out of the top-K
+    if report_id not in related_index:
+        try:
+            found = await run_in_threadpool(lookup_reports, [report_id])
+        except PyMongoError as e:
+            raise database_error(e)
+        if not found.get(report_id):
+            raise HTTPException(status_code=404, detail="Report not found")
+    open_counter.hit(report_id)
+    return {"success": True}
+
+def lookup_reports(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Reports by id, for endpoints that rank ids first"""
+    def lookup(store):
+        if store is not None:
+            return {report_id: store.get(report_id) for report_id in ids}
+        return {
+            report["id"]: report
+            for report in read_collection().find({"id": {"$in": ids}}, PUBLIC_PROJECTION)
+        }
+
+    return read_directory(lookup)
+
+@app.get("/api/reports/popular")
+async def get_popular_reports(limit: int = 10):
+    """Most opened reports, from the incrementally maintained top-K"""
+    try:
+        ranked = open_counter.top(max(1, min(limit, open_counter.k)))
+        found = lookup_reports([report_id for report_id, _ in ranked])
+        reports = [
+            {**found[report_id], "open_count": count}
+            for report_id, count in ranked if found.get(report_id)
+        ]
+        return {
+            "success": True,
+            "data": reports,
+            "total": len(reports)
+        }
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+MAX_RECENT_LIMIT = int(os.environ.get('MAX_RECENT_LIMIT', '200'))
+
+@app.get("/api/reports/recent")
+async def get_recent_reports(limit: int = 20, since: Optional[datetime] = None, group: Optional[str] = None):
+    """Most recently created or updated reports, newest first"""
     try:
-        # Build query
         query = {}
-        if group and group != "ALL":
+        group = group if group and group != "ALL" else None
+        if group:
             query["group"] = group
-        if search:
-            query["name"] = {"$regex": search, "$options": "i"}
-        
-        # Get reports from database
-        reports = list(reports_collection.find(query, {"_id": 0}))
-        
+        if since is not None:
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            query["updated_at"] = {"$gte": since}
+        limit = max(1, min(limit, MAX_RECENT_LIMIT))
+
+        def recent(store):
+            if store is not None:
+                matches = (report for report in store.find(group) if since is None or report["updated_at"] >= since)
+                return heapq.nlargest(limit, matches, key=lambda report: report["updated_at"])
+            # Walks the (group, updated_at) or updated_at index from the newest
+            # entry and stops after `limit` documents
+            return list(read_collection().find(query, PUBLIC_PROJECTION).sort("updated_at", -1).limit(limit))
+
+        reports = read_directory(recent)
         return {
             "success": True,
             "data": reports,
             "total": len(reports)
         }
+    except HTTPException:
+        raise
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@app.get("/api/groups")
-async def get_groups():
-    """Get all unique groups/areas"""
+@app.get("/api/reports/powerbi/{powerbi_report_id}")
+async def get_reports_by_powerbi_id(powerbi_report_id: str):
+    """Directory entries pointing to a given Power BI report"""
+    try:
+        powerbi_report_id = powerbi_report_id.strip().lower()
+        reports = read_directory(
+            lambda store: store.find_by_powerbi_report_id(powerbi_report_id) if store is not None
+            else list(read_collection().find({"powerbi_report_id": powerbi_report_id}, PUBLIC_PROJECTION))
+        )
+        return {
+            "success": True,
+            "data": reports,
+            "total": len(reports)
+        }
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+MAX_BATCH_IDS = int(os.environ.get('MAX_BATCH_IDS', '500'))
+
+class ReportBatchRequest(BaseModel):
+    ids: List[str]
+
+    @validator('ids')
+    def ids_within_limit(cls, v):
+        if len(v) > MAX_BATCH_IDS:
+            raise ValueError(f'At most {MAX_BATCH_IDS} ids per batch')
+        return v
+
+@app.post("/api/reports/batch")
+async def get_reports_batch(batch: ReportBatchRequest):
+    """Get many reports by ID in one call, in request order"""
+    try:
+        def lookup(store):
+            if store is not None:
+                return {report_id: store.get(report_id) for report_id in set(batch.ids)}
+            return {
+                report["id"]: report
+                for report in read_collection().find({"id": {"$in": list(set(batch.ids))}}, PUBLIC_PROJECTION)
+            }
+
+        found = read_directory(lookup)
+        results = [
+            {"id": report_id, "found": found.get(report_id) is not None, "report": found.get(report_id)}
+            for report_id in batch.ids
+        ]
+        return {
+            "success": True,
+            "data": results,
+            "total": len(results),
+            "missing": sum(1 for result in results if not result["found"])
+        }
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def encode_sync_token(moment: datetime) -> str:
+    return str(sync_millis(moment))
+
+def decode_sync_token(token: str) -> datetime:
     try:
-        groups = reports_collection.distinct("group")
+        if not token.isdigit():
+            raise ValueError(token)
+        return datetime(1970, 1, 1) + timedelta(milliseconds=int(token))
+    except (ValueError, OverflowError):
+        # OverflowError: too far past datetime.max
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+@app.get("/api/reports/changes")
+async def get_report_changes(since: Optional[str] = None):
+    """Reports created or updated since a sync token, plus deleted ids"""
+    since_at = decode_sync_token(since) if since else None
+    try:
+        # Served by the primary: a secondary lagging behind the token would
+        # make the client skip changes for good
+        now = datetime.utcnow()
+        horizon = now - timedelta(days=SYNC_TOMBSTONE_TTL_DAYS)
+        reset = since_at is None or since_at < horizon
+        if reset:
+            reports = list(reports_collection.find({}, PUBLIC_PROJECTION))
+            deleted = []
+        else:
+            reports = list(reports_collection.find({"updated_at": {"$gte": since_at}}, PUBLIC_PROJECTION))
+            deleted = [
+                doc["id"] for doc in
+                tombstones_collection.find({"deleted_at": {"$gte": since_at}}, {"_id": 0, "id": 1})
+            ]
         return {
             "success": True,
-            "data": sorted(groups)
+            "data": {
+                "reset": reset,
+                "reports": reports,
+                "deleted": deleted,
+                "token": encode_sync_token(now - timedelta(milliseconds=SYNC_SAFETY_MS))
+            }
         }
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -459,7 +1572,10 @@ async def get_groups():
 async def get_report(report_id: str):
     """Get a specific report by ID"""
     try:
-        report = reports_collection.find_one({"id": report_id}, {"_id": 0})
+        report = read_directory(
+            lambda store: store.get(report_id) if store is not None
+            else read_collection().find_one({"id": report_id}, PUBLIC_PROJECTION)
+        )
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
         
@@ -467,8 +1583,34 @@ async def get_report(report_id: str):
             "success": True,
             "data": report
         }
+    except HTTPException:
+        raise
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/api/reports/{report_id}/related")
+async def get_related_reports(report_id: str, limit: int = 10, same_group: bool = False):
+    """Reports with similar names, from other groups unless same_group=true"""
+    try:
+        if report_id not in related_index:
+            raise HTTPException(status_code=404, detail="Report not found")
+        ranked = related_index.related(report_id, max(1, min(limit, MAX_RELATED_LIMIT)), other_groups=not same_group)
+        found = lookup_reports([related_id for related_id, _ in ranked])
+        reports = [
+            {**found[related_id], "similarity": similarity}
+            for related_id, similarity in ranked if found.get(related_id)
+        ]
+        return {
+            "success": True,
+            "data": reports,
+            "total": len(reports)
+        }
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -476,14 +1618,19 @@ async def get_report(report_id: str):
 async def get_stats():
     """Get statistics about the reports"""
     try:
-        total_reports = reports_collection.count_documents({})
-        
-        # Count by group
-        pipeline = [
-            {"$group": {"_id": "$group", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
-        group_stats = list(reports_collection.aggregate(pipeline))
+        def stats(store):
+            if store is not None:
+                return len(store), store.group_stats()
+            total_reports = read_collection().count_documents({})
+            
+            # Count by group
+            pipeline = [
+                {"$group": {"_id": "$group", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ]
+            return total_reports, list(read_collection().aggregate(pipeline))
+
+        total_reports, group_stats = read_directory(stats)
         
         return {
             "success": True,
@@ -492,13 +1639,14 @@ async def get_stats():
                 "groups": group_stats
             }
         }
+    except HTTPException:
+        raise
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 # Administration endpoints
-from pydantic import BaseModel, validator
 
 class ReportCreate(BaseModel):
     name: str
@@ -553,7 +1701,7 @@ class ReportUpdate(BaseModel):
         return v
 
 @app.post("/api/admin/reports")
-async def create_report(report: ReportCreate):
+async def create_report(report: ReportCreate, request: Request):
     """Create a new report"""
     try:
         # Check if report with same name and group already exists
@@ -561,20 +1709,28 @@ async def create_report(report: ReportCreate):
         if existing:
             raise HTTPException(status_code=400, detail="Ya existe un informe con ese nombre en el mismo grupo")
         
-        # Create new report
+        # Create new report; created_at == updated_at tells the event feed it is new
+        now = datetime.utcnow()
         new_report = {
             "id": str(uuid.uuid4()),
             "name": report.name,
+            "name_key": name_key(report.name),
+            "name_tokens": name_tokens(report.name),
             "group": report.group,
             "url": report.url,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            **parse_powerbi_ids(report.url),
+            "created_at": now,
+            "updated_at": now
         }
         
         result = reports_collection.insert_one(new_report)
+        mark_write(request)
         if result.inserted_id:
-            # Remove MongoDB's _id from response
+            # Remove MongoDB's _id and internal fields from response
             new_report.pop("_id", None)
+            new_report.pop("name_key", None)
+            new_report.pop("name_tokens", None)
+            record_change("created", new_report, request)
             return {
                 "success": True,
                 "message": "Informe creado exitosamente",
@@ -586,12 +1742,12 @@ async def create_report(report: ReportCreate):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.put("/api/admin/reports/{report_id}")
-async def update_report(report_id: str, report: ReportUpdate):
+async def update_report(report_id: str, report: ReportUpdate, request: Request):
     """Update an existing report"""
     try:
         # Check if report exists
@@ -603,10 +1759,16 @@ async def update_report(report_id: str, report: ReportUpdate):
         update_data = {"updated_at": datetime.utcnow()}
         if report.name is not None:
             update_data["name"] = report.name
+            update_data["name_key"] = name_key(report.name)
+            update_data["name_tokens"] = name_tokens(report.name)
         if report.group is not None:
             update_data["group"] = report.group
         if report.url is not None:
             update_data["url"] = report.url
+            update_data.update(parse_powerbi_ids(report.url))
+            if report.url != existing.get("url"):
+                # The previous health check was for the old URL
+                update_data.update({"link_status": None, "link_http_status": None, "link_checked_at": None})
         
         # Check for duplicates if name or group is being updated
         if report.name is not None or report.group is not None:
@@ -623,9 +1785,12 @@ async def update_report(report_id: str, report: ReportUpdate):
         
         # Update report
         result = reports_collection.update_one({"id": report_id}, {"$set": update_data})
+        mark_write(request)
         
         if result.modified_count > 0:
-            updated_report = reports_collection.find_one({"id": report_id}, {"_id": 0})
+            updated_report = reports_collection.find_one({"id": report_id}, PUBLIC_PROJECTION)
+            if updated_report:
+                record_change("updated", updated_report, request, before=existing)
             return {
                 "success": True,
                 "message": "Informe actualizado exitosamente",
@@ -641,12 +1806,12 @@ async def update_report(report_id: str, report: ReportUpdate):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.delete("/api/admin/reports/{report_id}")
-async def delete_report(report_id: str):
+async def delete_report(report_id: str, request: Request):
     """Delete a report"""
     try:
         # Check if report exists
@@ -656,8 +1821,20 @@ async def delete_report(report_id: str):
         
         # Delete report
         result = reports_collection.delete_one({"id": report_id})
+        mark_write(request)
         
         if result.deleted_count > 0:
+            # Name and group let the event feed describe the deletion
+            existing["deleted_at"] = datetime.utcnow()
+            tombstones_collection.update_one(
+                {"id": report_id},
+                {"$set": {field: existing.get(field) for field in ("id", "name", "group", "deleted_at")}},
+                upsert=True
+            )
+            existing.pop("_id", None)
+            opens_collection.delete_one({"id": report_id})
+            open_counter.remove(report_id)
+            record_change("deleted", existing, request)
             return {
                 "success": True,
                 "message": "Informe eliminado exitosamente"
@@ -666,7 +1843,7 @@ async def delete_report(report_id: str):
             raise HTTPException(status_code=500, detail="Error al eliminar el informe")
             
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -710,13 +1887,195 @@ async def delete_group(group_name: str):
         }
         
     except PyMongoError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        raise database_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+@app.get("/api/admin/reports/{report_id}/history")
+async def get_report_history(report_id: str, limit: int = 100):
+    """Change history of one report, newest first"""
+    try:
+        limit = max(1, min(limit, 1000))
+        pending = audit_trail.pending_for(report_id)
+        stored = list(history_collection.find({"report_id": report_id}).sort("at", -1).limit(limit))
+        events = merge_history(pending, stored, limit)
+        return {
+            "success": True,
+            "data": events,
+            "total": len(events)
+        }
+    except PyMongoError as e:
+        raise database_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-from fastapi.staticfiles import StaticFiles
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
\ No newline at end of file
+# With a service principal configured, reports with known workspace and
+# report ids are verified in the Power BI REST API; anonymous URL probes can
+# only reach the sign-in page and are recorded as unverified
+POWERBI_TENANT_ID = os.environ.get('POWERBI_TENANT_ID')
+POWERBI_CLIENT_ID = os.environ.get('POWERBI_CLIENT_ID')
+POWERBI_CLIENT_SECRET = os.environ.get('POWERBI_CLIENT_SECRET')
+link_checker = LinkChecker(
+    concurrency=int(os.environ.get('LINK_CHECK_CONCURRENCY', '10')),
+    per_host_rate=float(os.environ.get('LINK_CHECK_PER_HOST_RATE', '5')),
+    timeout=float(os.environ.get('LINK_CHECK_TIMEOUT', '10')),
+    cache_ttl=float(os.environ.get('LINK_CHECK_CACHE_SECONDS', '3600')),
+    powerbi=PowerBIApi(POWERBI_TENANT_ID, POWERBI_CLIENT_ID, POWERBI_CLIENT_SECRET)
+    if POWERBI_TENANT_ID and POWERBI_CLIENT_ID and POWERBI_CLIENT_SECRET else None,
+)
+LINK_CHECK_INTERVAL_SECONDS = float(os.environ.get('LINK_CHECK_INTERVAL_SECONDS', '0'))
+link_check_state = {"running": False, "started_at": None, "finished_at": None, "checked": 0, "broken": 0, "unverified": 0}
+
+async def run_link_check():
+    """Check every stored URL and record the outcome on each report"""
+    link_check_state.update(running=True, started_at=datetime.utcnow())
+    try:
+        docs = await run_in_threadpool(lambda: list(reports_collection.find(
+            {}, {"_id": 0, "id": 1, "url": 1, "workspace_id": 1, "powerbi_report_id": 1}
+        )))
+        targets = {doc["id"]: link_checker.target(doc) for doc in docs}
+        results = await link_checker.check_all(targets.values())
+        updates = [
+            # Matching on url too skips reports whose URL was edited meanwhile
+            UpdateOne({"id": doc["id"], "url": doc["url"]}, {"$set": results[targets[doc["id"]]]})
+            for doc in docs
+        ]
+        if updates:
+            await run_in_threadpool(reports_collection.bulk_write, updates, ordered=False)
+        statuses = Counter(results[targets[doc["id"]]]["link_status"] for doc in docs)
+        link_check_state.update(checked=len(docs), broken=statuses["broken"], unverified=statuses["unverified"])
+        await run_in_threadpool(refresh_memory_store)
+        directory_snapshot.invalidate()
+    except PyMongoError as e:
+        print(f"Error running link health check: {e}")
+    finally:
+        link_check_state.update(running=False, finished_at=datetime.utcnow())
+
+async def link_check_loop():
+    while True:
+        await asyncio.sleep(LINK_CHECK_INTERVAL_SECONDS)
+        if not link_check_state["running"]:
+            await run_link_check()
+
+@app.on_event("startup")
+async def start_link_checks():
+    if LINK_CHECK_INTERVAL_SECONDS > 0:
+        asyncio.create_task(link_check_loop())
+
+@app.post("/api/admin/link-check")
+async def start_link_check():
+    """Start a link health check in the background"""
+    if not link_check_state["running"]:
+        detached(run_link_check())
+        link_check_state["running"] = True
+    return {
+        "success": True,
+        "data": link_check_state
+    }
+
+@app.get("/api/admin/link-check")
+async def get_link_check_status():
+    """State of the last link health check"""
+    return {
+        "success": True,
+        "data": {**link_check_state, **link_checker.metrics()}
+    }
+
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', '0.6'))
+duplicate_scan = {"running": False, "started_at": None, "finished_at": None, "result": None}
+
+async def run_duplicate_scan():
+    """Find clusters of near-duplicate reports across the whole directory"""
+    duplicate_scan.update(running=True, started_at=datetime.utcnow())
+    try:
+        reports = await run_in_threadpool(load_directory)
+        duplicate_scan["result"] = await run_in_threadpool(find_duplicates, reports, DUPLICATE_THRESHOLD)
+    except (PyMongoError, HTTPException) as e:
+        print(f"Error scanning for duplicate reports: {e}")
+    finally:
+        duplicate_scan.update(running=False, finished_at=datetime.utcnow())
+
+@app.post("/api/admin/duplicates")
+async def start_duplicate_scan():
+    """Start a near-duplicate scan in the background"""
+    if not duplicate_scan["running"]:
+        detached(run_duplicate_scan())
+        duplicate_scan["running"] = True
+    return {
+        "success": True,
+        "data": {key: value for key, value in duplicate_scan.items() if key != "result"}
+    }
+
+@app.get("/api/admin/duplicates")
+async def get_duplicates(limit: int = 100):
+    """Largest clusters found by the last near-duplicate scan"""
+    result = duplicate_scan["result"]
+    data = {key: value for key, value in duplicate_scan.items() if key != "result"}
+    if result is not None:
+        data.update(result, clusters=result["clusters"][:max(1, limit)], total_clusters=len(result["clusters"]))
+    return {
+        "success": True,
+        "data": data
+    }
+
+@app.get("/api/admin/traces")
+async def get_traces(limit: int = 20, trace_id: Optional[str] = None):
+    """Recent sampled traces from the in-process ring buffer"""
+    traces = tracer.exporter.traces(max(1, limit), trace_id)
+    return {
+        "success": True,
+        "data": traces,
+        "total": len(traces)
+    }
+
+async def profile_window(seconds: float):
+    session = profiler.start(f"window {seconds:g}s")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await run_in_threadpool(profiler.stop, session)
+
+@app.post("/api/admin/profile")
+async def start_profile(seconds: float = 30):
+    """Sample every thread of this worker for a time window"""
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS:g}")
+    detached(profile_window(seconds))
+    return {
+        "success": True,
+        "data": {"seconds": seconds, "pid": os.getpid(), **profiler.metrics()}
+    }
+
+@app.get("/api/admin/profile")
+async def get_profiles():
+    """Active profiling sessions and collapsed-stack files written so far"""
+    return {
+        "success": True,
+        "data": {**profiler.metrics(), "files": profiler.files()}
+    }
+
+@app.get("/api/admin/profile/{name}")
+async def get_profile(name: str):
+    """A collapsed-stack file, ready for flamegraph.pl or speedscope"""
+    if name not in profiler.files():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(os.path.join(profiler.output_dir, name), encoding="utf-8") as f:
+        return Response(f.read(), media_type="text/plain")
+
+@app.on_event("startup")
+async def start_audit_trail():
+    asyncio.create_task(audit_trail.run())
+
+@app.on_event("shutdown")
+def close_mongo_client():
+    # Write out queued audit events and open counts before the connection goes away
+    audit_trail.flush()
+    open_counter.flush()
+    client.close()
+
+from static_assets import SpaStaticFiles
+app.mount("/", SpaStaticFiles(directory="static"), name="static")
+
+if __name__ == "__main__":
+    from serve import main
+    main()
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""Production serving of the built frontend bundle.
+
+The build directory is scanned once at startup. Fingerprinted assets
+(``main.4225530a.js``) are served with a one year immutable cache policy,
+HTML is served with ``no-cache`` so browsers revalidate it by ETag, and
+precompressed ``.br``/``.gz`` siblings are picked according to
+Accept-Encoding. Files below ``memory_limit`` are kept in memory; larger
+ones are streamed from disk without being stat'ed again.
+
+Run ``python static_assets.py static`` after a frontend build to write the
+compressed siblings.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+DEFAULT_CACHE = "public, max-age=3600"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = (".html", ".js", ".css", ".json", ".map", ".svg", ".txt", ".ico")
+
+
+@dataclass
+class _Variant:
+    path: str
+    stat: os.stat_result
+    etag: str
+    body: Optional[bytes] = None
+
+
+@dataclass
+class _Asset:
+    media_type: str
+    cache_control: str
+    variants: Dict[str, _Variant] = field(default_factory=dict)
+
+
+def _cache_policy(rel_path: str) -> str:
+    if rel_path.endswith(".html"):
+        return REVALIDATE
+    if HASHED_NAME.search(os.path.basename(rel_path)):
+        return IMMUTABLE
+    return DEFAULT_CACHE
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: qvalue}"""
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def _choose_encoding(header: str, available: Iterable[str]) -> str:
+    """Best precompressed variant the client accepts, in ENCODINGS order on
+    ties; identity only wins when it is listed with a higher qvalue"""
+    accepted = _accepted_encodings(header)
+    best, best_q = "identity", accepted.get("identity", 0.0)
+    for candidate, _ in ENCODINGS:
+        if candidate not in available:
+            continue
+        q = accepted.get(candidate, accepted.get("*", 0.0))
+        if q > 0 and (q > best_q or (best == "identity" and q == best_q)):
+            best, best_q = candidate, q
+    return best
+
+
+class SpaStaticFiles:
+    """ASGI app serving a prebuilt single page application"""
+
+    def __init__(self, directory: str, memory_limit: int = 256 * 1024):
+        if not os.path.isdir(directory):
+            raise RuntimeError(f"Directory '{directory}' does not exist")
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.assets: Dict[str, _Asset] = {}
+        self._scan()
+
+    def _load_variant(self, path: str) -> _Variant:
+        stat = os.stat(path)
+        variant = _Variant(path=path, stat=stat, etag="")
+        if stat.st_size <= self.memory_limit:
+            with open(path, "rb") as f:
+                variant.body = f.read()
+            digest = hashlib.md5(variant.body).hexdigest()
+        else:
+            digest = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        variant.etag = f'"{digest}"'
+        return variant
+
+    def _scan(self) -> None:
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith((".br", ".gz")):
+                    continue
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                asset = _Asset(media_type=media_type, cache_control=_cache_policy(rel_path))
+                asset.variants["identity"] = self._load_variant(full_path)
+                for encoding, suffix in ENCODINGS:
+                    if os.path.isfile(full_path + suffix):
+                        asset.variants[encoding] = self._load_variant(full_path + suffix)
+                self.assets[rel_path] = asset
+
+    def _lookup(self, path: str) -> Optional[_Asset]:
+        path = path.lstrip("/")
+        if path == "" or path.endswith("/"):
+            path += "index.html"
+        asset = self.assets.get(path)
+        if asset is None and "." not in os.path.basename(path):
+            asset = self.assets.get(path + "/index.html")
+        return asset
+
+    async def __call__(self, scope, receive, send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+            await response(scope, receive, send)
+            return
+
+        asset = self._lookup(scope["path"])
+        if asset is None:
+            asset = self.assets.get("404.html")
+            if asset is None:
+                await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+                return
+            status_code = 404
+        else:
+            status_code = 200
+
+        request_headers = Headers(scope=scope)
+        encoding = _choose_encoding(request_headers.get("accept-encoding", ""), asset.variants)
+        variant = asset.variants[encoding]
+
+        headers = {
+            "cache-control": asset.cache_control,
+            "etag": variant.etag,
+            "vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+
+        if status_code == 200 and variant.etag in request_headers.get("if-none-match", ""):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        if variant.body is None:
+            response = FileResponse(
+                variant.path,
+                status_code=status_code,
+                headers=headers,
+                media_type=asset.media_type,
+                stat_result=variant.stat,
+                method=scope["method"],
+            )
+        else:
+            headers["content-length"] = str(variant.stat.st_size)
+            body = b"" if scope["method"] == "HEAD" else variant.body
+            response = Response(body, status_code=status_code, headers=headers, media_type=asset.media_type)
+        await response(scope, receive, send)
+
+
+def precompress(directory: str, min_size: int = 1024) -> None:
+    """Write .gz (and .br when the brotli package is installed) siblings"""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+
+
+if __name__ == "__main__":
+    import sys
+
+    precompress(sys.argv[1] if len(sys.argv) > 1 else "static")
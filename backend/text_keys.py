@@ -0,0 +1,61 @@
+"""Text keys for sorting and matching report names the way Spanish readers expect."""
+from typing import Any, Dict, List, Optional
+import re
+import unicodedata
+
+
+def fold(value: str) -> str:
+    """Lowercase and strip accents: 'Análisis Ñ' -> 'analisis n'"""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def spanish_sort_key(value: str):
+    """Sort key approximating the Mongo 'es' collation.
+
+    Accents and case only break ties, and ñ sorts as its own letter after n.
+    """
+    composed = unicodedata.normalize("NFC", value.casefold())
+    primary = fold(composed.replace("ñ", "n\x7f"))
+    return primary, value
+
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def name_key(value: str) -> str:
+    """Searchable form of a report name: folded words separated by single spaces"""
+    return _NON_WORD.sub(" ", fold(value)).strip()
+
+
+def name_tokens(value: str) -> List[str]:
+    """Distinct folded words of a report name, stored for the multikey index"""
+    return list(dict.fromkeys(name_key(value).split()))
+
+
+def search_words(search: Optional[str]) -> Optional[List[str]]:
+    """Folded words of a search; each must start some word of the name.
+
+    Returns None when there is no search. A search without letters or digits
+    gives an empty list, which matches nothing rather than the whole
+    directory.
+    """
+    if not search:
+        return None
+    return list(dict.fromkeys(name_key(search).split()))
+
+
+def search_filter(search: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Mongo filter over name_tokens for search_words(search).
+
+    Each word becomes an anchored prefix regex on the tokens array, which
+    Mongo turns into a range scan of the (group, name_tokens) multikey
+    index. The words are folded and escaped, so the user's text can never
+    inject regex syntax.
+    """
+    words = search_words(search)
+    if words is None:
+        return None
+    if not words:
+        return {"name_tokens": {"$in": []}}
+    return {"$and": [{"name_tokens": {"$regex": f"^{re.escape(word)}"}} for word in words]}
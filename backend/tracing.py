@@ -0,0 +1,225 @@
+"""Lightweight request tracing.
+
+A sampled request gets a trace made of spans:
+
+- a root span for the whole request;
+- ``validate`` from arrival to the handler call, which includes admission
+  queueing and request parsing and validation;
+- ``handler <name>`` while the endpoint runs;
+- ``serialize`` from the endpoint's return to the finished response;
+- one ``mongo <command>`` span per Mongo command, recorded by a pymongo
+  CommandListener;
+- spans opened explicitly with ``tracer.span(...)``.
+
+The current span lives in a context variable, so spans opened in the
+threadpool nest correctly. When a request is not sampled the hooks find no
+current span and return immediately.
+
+Finished traces go to an exporter: a ring buffer readable from the admin
+API, or a JSON-lines file.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+import asyncio
+import functools
+import json
+import os
+import random
+import threading
+import time
+
+from pymongo import monitoring
+
+
+class Trace:
+    __slots__ = ("trace_id", "started_at", "spans", "handler_start", "handler_end")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.spans: List["Span"] = []
+        self.handler_start: Optional[float] = None
+        self.handler_end: Optional[float] = None
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], start: Optional[float] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+
+    def finish(self, end: Optional[float] = None) -> None:
+        self.end = time.perf_counter() if end is None else end
+        self.trace.spans.append(self)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class RingBufferExporter:
+    def __init__(self, size: int = 200):
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=size)
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        self._traces.append(trace)
+
+    def traces(self, limit: int = 50, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        found = [trace for trace in reversed(self._traces) if trace_id is None or trace["trace_id"] == trace_id]
+        return found[:limit]
+
+
+class FileExporter:
+    """Appends one JSON line per trace"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        line = json.dumps(trace, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def traces(self, limit: int = 50, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return []
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, exporter=None, follow_parent: bool = False):
+        self.sample_rate = sample_rate
+        # Also trace when the caller sampled the request, even at rate 0
+        self.follow_parent = follow_parent
+        self.exporter = exporter or RingBufferExporter()
+        self.started = 0
+        self.exported = 0
+        self.command_listener = _CommandListener(self)
+
+    def start_trace(self, name: str, trace_id: Optional[str] = None, parent_sampled: bool = False) -> Optional[Span]:
+        """Root span for a request if it is sampled, made current.
+
+        A caller that sampled the request is followed only while tracing
+        is enabled, or always with ``follow_parent``.
+        """
+        followed = parent_sampled and (self.sample_rate > 0 or self.follow_parent)
+        if not followed and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        root = Span(Trace(trace_id or os.urandom(16).hex()), name, None)
+        _current_span.set(root)
+        self.started += 1
+        return root
+
+    def finish_trace(self, root: Span, **attributes) -> None:
+        root.attributes.update(attributes)
+        root.finish()
+        _current_span.set(None)
+        origin = root.start
+        self.exporter.export({
+            "trace_id": root.trace.trace_id,
+            "name": root.name,
+            "started_at": root.trace.started_at,
+            "duration_ms": round((root.end - origin) * 1000, 3),
+            "spans": [
+                {
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "start_ms": round((span.start - origin) * 1000, 3),
+                    "duration_ms": round((span.end - span.start) * 1000, 3),
+                    **({"attributes": span.attributes} if span.attributes else {}),
+                }
+                for span in sorted(root.trace.spans, key=lambda span: span.start)
+            ],
+        })
+        self.exported += 1
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+    def record(self, name: str, start: float, end: float, **attributes) -> None:
+        """Add an already timed span under the current one"""
+        parent = _current_span.get()
+        if parent is not None:
+            Span(parent.trace, name, parent.span_id, start, attributes).finish(end)
+
+    def wrap_endpoint(self, endpoint: Callable) -> Callable:
+        """Time the validate and handler phases of an async endpoint"""
+        if not asyncio.iscoroutinefunction(endpoint):
+            return endpoint
+
+        @functools.wraps(endpoint)
+        async def traced(*args, **kwargs):
+            root = _current_span.get()
+            if root is None:
+                return await endpoint(*args, **kwargs)
+            trace = root.trace
+            trace.handler_start = time.perf_counter()
+            self.record("validate", root.start, trace.handler_start)
+            try:
+                with self.span(f"handler {endpoint.__name__}"):
+                    return await endpoint(*args, **kwargs)
+            finally:
+                trace.handler_end = time.perf_counter()
+
+        return traced
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "follow_parent": self.follow_parent,
+            "started": self.started,
+            "exported": self.exported,
+        }
+
+
+class _CommandListener(monitoring.CommandListener):
+    """Turns Mongo commands issued inside a sampled request into spans.
+
+    pymongo calls listeners on the thread running the command, so the
+    request's current span is visible here.
+    """
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._collections: Dict[Any, Any] = {}
+
+    def started(self, event):
+        if _current_span.get() is not None:
+            self._collections[(event.request_id, event.connection_id)] = event.command.get(event.command_name)
+
+    def _finish(self, event, **attributes):
+        collection = self._collections.pop((event.request_id, event.connection_id), None)
+        if _current_span.get() is None:
+            return
+        end = time.perf_counter()
+        if isinstance(collection, str):
+            attributes["collection"] = collection
+        self.tracer.record(
+            f"mongo {event.command_name}", end - event.duration_micros / 1e6, end,
+            db=event.database_name, server="%s:%s" % event.connection_id, **attributes
+        )
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, error=str(event.failure.get("errmsg", event.failure))[:200])
@@ -3,6 +3,23 @@ import './App.css';
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+// After an admin write the API returns X-Read-Primary-Until; sending it back
+// keeps our reads on the primary so the refreshed lists show the change
+const READ_PRIMARY_HEADER = 'X-Read-Primary-Until';
+let readPrimaryUntil = null;
+
+const apiFetch = async (url, options = {}) => {
+  const headers = readPrimaryUntil
+    ? { ...options.headers, [READ_PRIMARY_HEADER]: readPrimaryUntil }
+    : options.headers;
+  const response = await fetch(url, { ...options, headers });
+  const until = response.headers.get(READ_PRIMARY_HEADER);
+  if (until) {
+    readPrimaryUntil = until;
+  }
+  return response;
+};
+
 // Power BI Usage Metrics URL
 const POWERBI_METRICS_URL = 'https://app.powerbi.com/groups/cdb9df2c-4dfa-4824-888d-26de261e1c52/reports/1fe1bfbc-c42d-4292-86e0-e7ffb54037d7/a04359c48f27001e9786?experience=power-bi';
 
@@ -127,8 +144,8 @@ const AdminModal = ({ isOpen, onClose, onRefresh }) => {
   const fetchAdminData = async () => {
     try {
       const [reportsRes, groupsRes] = await Promise.all([
-        fetch(`${API_BASE_URL}/api/reports`),
-        fetch(`${API_BASE_URL}/api/groups`)
+        apiFetch(`${API_BASE_URL}/api/reports`),
+        apiFetch(`${API_BASE_URL}/api/groups`)
       ]);
       
       const reportsData = await reportsRes.json();
@@ -152,7 +169,7 @@ const AdminModal = ({ isOpen, onClose, onRefresh }) => {
     setLoading(true);
     
     try {
-      const response = await fetch(`${API_BASE_URL}/api/admin/reports`, {
+      const response = await apiFetch(`${API_BASE_URL}/api/admin/reports`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(newReport)
@@ -182,7 +199,7 @@ const AdminModal = ({ isOpen, onClose, onRefresh }) => {
     setLoading(true);
     
     try {
-      const response = await fetch(`${API_BASE_URL}/api/admin/reports/${editingReport.id}`, {
+      const response = await apiFetch(`${API_BASE_URL}/api/admin/reports/${editingReport.id}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -217,7 +234,7 @@ const AdminModal = ({ isOpen, onClose, onRefresh }) => {
     setLoading(true);
     
     try {
-      const response = await fetch(`${API_BASE_URL}/api/admin/reports/${reportId}`, {
+      const response = await apiFetch(`${API_BASE_URL}/api/admin/reports/${reportId}`, {
         method: 'DELETE'
       });
       
@@ -460,7 +477,7 @@ const AdminModal = ({ isOpen, onClose, onRefresh }) => {
                     onClick={async () => {
                       if (!newGroup.trim()) return;
                       try {
-                        const response = await fetch(`${API_BASE_URL}/api/admin/groups`, {
+                        const response = await apiFetch(`${API_BASE_URL}/api/admin/groups`, {
                           method: 'POST',
                           headers: { 'Content-Type': 'application/json' },
                           body: JSON.stringify({ name: newGroup })
@@ -537,9 +554,9 @@ function App() {
 
       // Fetch all data concurrently
       const [reportsResponse, groupsResponse, statsResponse] = await Promise.all([
-        fetch(`${API_BASE_URL}/api/reports`),
-        fetch(`${API_BASE_URL}/api/groups`),
-        fetch(`${API_BASE_URL}/api/stats`)
+        apiFetch(`${API_BASE_URL}/api/reports`),
+        apiFetch(`${API_BASE_URL}/api/groups`),
+        apiFetch(`${API_BASE_URL}/api/stats`)
       ]);
 
       if (!reportsResponse.ok || !groupsResponse.ok || !statsResponse.ok) {
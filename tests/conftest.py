@@ -0,0 +1,79 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+# Test modules import the backend modules directly
+sys.path.insert(0, BACKEND_DIR)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def mongo_replica_set(tmp_path_factory):
+    """Three-member local replica set; yields its connection string"""
+    mongod = shutil.which('mongod')
+    if mongod is None:
+        pytest.skip("mongod not available")
+    from pymongo import MongoClient
+
+    ports = [_free_port() for _ in range(3)]
+    processes = []
+    for port in ports:
+        dbpath = tmp_path_factory.mktemp(f"rs-{port}")
+        processes.append(subprocess.Popen(
+            [mongod, '--replSet', 'rs0', '--port', str(port), '--bind_ip', '127.0.0.1',
+             '--dbpath', str(dbpath), '--quiet'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+    try:
+        seed = MongoClient(f"mongodb://127.0.0.1:{ports[0]}/", directConnection=True, serverSelectionTimeoutMS=20000)
+        seed.admin.command('replSetInitiate', {
+            '_id': 'rs0',
+            'members': [
+                # Only the first member can become primary so tests know where writes land
+                {'_id': i, 'host': f"127.0.0.1:{port}", 'priority': 1 if i == 0 else 0}
+                for i, port in enumerate(ports)
+            ],
+        })
+        uri = f"mongodb://{','.join(f'127.0.0.1:{p}' for p in ports)}/?replicaSet=rs0"
+        probe = MongoClient(uri, serverSelectionTimeoutMS=30000)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if probe.primary and len(probe.secondaries) == 2:
+                break
+            time.sleep(0.5)
+        else:
+            pytest.fail("replica set did not elect a primary with two secondaries")
+        seed.close()
+        probe.close()
+        yield uri
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+@pytest.fixture
+def load_server(monkeypatch):
+    """Import backend/server.py fresh under the given environment"""
+    def load(**env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        monkeypatch.chdir(BACKEND_DIR)
+        monkeypatch.syspath_prepend(BACKEND_DIR)
+        sys.modules.pop('server', None)
+        import server
+        return server
+    yield load
+    sys.modules.pop('server', None)
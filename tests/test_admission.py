@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from admission import ConcurrencyLimiter, Overloaded
+
+
+async def hold(limiter, release):
+    async with limiter.slot():
+        await release.wait()
+
+
+def test_full_queue_rejects_immediately():
+    limiter = ConcurrencyLimiter("read", limit=1, queue_size=1, queue_timeout=5)
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(limiter, release))
+        queued = asyncio.ensure_future(hold(limiter, release))
+        await asyncio.sleep(0.01)
+        assert (limiter.active, limiter.waiting) == (1, 1)
+        with pytest.raises(Overloaded):
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(main())
+    assert limiter.metrics() == {
+        "limit": 1, "queue_size": 1, "active": 0, "waiting": 0, "admitted": 2, "rejected": 1,
+    }
+
+
+def test_queued_request_times_out():
+    limiter = ConcurrencyLimiter("admin", limit=1, queue_size=4, queue_timeout=0.05)
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(hold(limiter, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            async with limiter.slot():
+                pass
+        assert limiter.waiting == 0
+        release.set()
+        await running
+        # The slot given up by the timed-out waiter is not lost
+        async with limiter.slot():
+            assert limiter.active == 1
+
+    asyncio.run(main())
+    assert (limiter.admitted, limiter.rejected) == (2, 1)
@@ -0,0 +1,112 @@
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+from audit import AuditTrail, merge_history
+
+
+class FakeHistory:
+    """Just enough of a collection for AuditTrail; `fail` decides each insert"""
+
+    def __init__(self):
+        self.docs = {}
+        self.batches = []
+        self.fail = None
+        self.during_insert = None
+
+    def insert_many(self, docs, ordered=True):
+        self.batches.append([doc["report_id"] for doc in docs])
+        if self.during_insert:
+            self.during_insert()
+        error = self.fail(docs) if self.fail else None
+        if error is not None:
+            raise error
+        for doc in docs:
+            self.docs[doc["_id"]] = doc
+
+
+def record(trail, *report_ids):
+    for report_id in report_ids:
+        trail.record(report_id, "updated", "ana", "10.0.0.1", {"name": ["a", "b"]})
+
+
+def test_flush_writes_in_batches_in_order():
+    history = FakeHistory()
+    trail = AuditTrail(history, batch_size=2)
+    record(trail, "r1", "r2", "r3", "r4", "r5")
+    assert trail.flush() == 5
+    assert history.batches == [["r1", "r2"], ["r3", "r4"], ["r5"]]
+    assert trail.metrics() == {"queued": 0, "recorded": 5, "flushed": 5, "dropped": 0, "errors": 0}
+
+
+def test_failed_batch_is_retried_on_the_next_flush():
+    history = FakeHistory()
+    trail = AuditTrail(history, batch_size=2)
+    record(trail, "r1", "r2", "r3")
+    history.fail = lambda docs: ServerSelectionTimeoutError("no servers")
+    assert trail.flush() == 0
+    assert trail.metrics()["queued"] == 3
+    assert trail.metrics()["errors"] == 1
+
+    history.fail = None
+    record(trail, "r4")
+    assert trail.flush() == 4
+    assert [doc["report_id"] for doc in history.docs.values()] == ["r1", "r2", "r3", "r4"]
+
+
+def test_requeue_drops_the_oldest_when_events_arrived_meanwhile():
+    history = FakeHistory()
+    trail = AuditTrail(history, max_queue=3, batch_size=3)
+    record(trail, "r1", "r2", "r3")
+    # Two admin writes land while the batch is being inserted
+    history.during_insert = lambda: record(trail, "r4", "r5") if len(history.batches) == 1 else None
+    history.fail = lambda docs: ServerSelectionTimeoutError("no servers")
+    assert trail.flush() == 0
+    assert [event["report_id"] for event in trail._queue] == ["r3", "r4", "r5"]
+    assert trail.metrics()["dropped"] == 2
+
+    history.fail = None
+    assert trail.flush() == 3
+    assert trail.metrics()["recorded"] - trail.metrics()["dropped"] == trail.metrics()["flushed"]
+
+
+def test_duplicate_keys_count_as_written():
+    history = FakeHistory()
+    trail = AuditTrail(history)
+    record(trail, "r1", "r2")
+    history.fail = lambda docs: BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}]})
+    assert trail.flush() == 2
+    assert trail.metrics()["queued"] == 0
+
+    # Any other write error puts the batch back
+    record(trail, "r3")
+    history.fail = lambda docs: BulkWriteError({"writeErrors": [{"index": 0, "code": 121}]})
+    assert trail.flush() == 0
+    assert trail.metrics()["queued"] == 1
+    assert trail.metrics()["errors"] == 1
+
+
+def test_history_lists_an_event_being_written_once():
+    history = FakeHistory()
+    trail = AuditTrail(history)
+    record(trail, "r1", "r2")
+    assert trail.flush() == 2
+    record(trail, "r1", "r1")
+    seen = []
+
+    def read_history():
+        # While the batch is in flight it is still pending; here the insert
+        # has already landed by the time the stored events are read
+        pending = trail.pending_for("r1")
+        history.docs.update({doc["_id"]: doc for doc in trail._inflight})
+        stored = sorted(
+            (doc for doc in history.docs.values() if doc["report_id"] == "r1"),
+            key=lambda doc: doc["at"], reverse=True,
+        )
+        seen.append(merge_history(pending, stored, limit=10))
+
+    history.during_insert = read_history
+    assert trail.flush() == 2
+    events = seen[0]
+    assert len(events) == 3
+    assert all("_id" not in event for event in events)
+    assert [event["at"] for event in events] == sorted((event["at"] for event in events), reverse=True)
+    assert len(merge_history([], [{"_id": i, "at": i} for i in range(5)], limit=2)) == 2
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from coalescing import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_factory_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def query(key):
+        calls.append(key)
+        await asyncio.sleep(0.02)
+        return f"body {key}"
+
+    async def main():
+        results = await asyncio.gather(*(flight.run(key, lambda key=key: query(key)) for key in ["a"] * 5 + ["b"] * 2))
+        # Once finished, the next call runs the query again
+        again = await flight.run("a", lambda: query("a"))
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert results == ["body a"] * 5 + ["body b"] * 2
+    assert again == "body a"
+    assert calls == ["a", "b", "a"]
+    assert flight.metrics() == {"in_flight": 0, "leaders": 3, "followers": 5}
+
+
+def test_disconnecting_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+    finished = []
+
+    async def query():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return "body"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run("k", query))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run("k", query))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        try:
+            await leader
+        except asyncio.CancelledError:
+            pass
+        return leader, result
+
+    leader, result = asyncio.run(main())
+    assert leader.cancelled()
+    assert result == "body"
+    assert finished == [True]
+
+
+def test_equivalent_searches_share_a_key(monkeypatch, load_server):
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    database = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: database)
+    server = load_server()
+    keys = []
+    run = server.report_queries.run
+
+    async def recording_run(key, factory):
+        keys.append(key)
+        return await run(key, factory)
+
+    monkeypatch.setattr(server.report_queries, "run", recording_run)
+    with TestClient(server.app) as api:
+        bodies = [api.get("/api/reports", params={"search": search}).json()
+                  for search in ["Nómina región", "region  NOMINA", "nomina,region"]]
+        empty = api.get("/api/reports", params={"search": "¿?"}).json()
+    assert len(set(keys[:3])) == 1
+    assert keys[0][0].search == "nomina region"
+    assert bodies[0] == bodies[1] == bodies[2]
+    # A search without words still matches nothing
+    assert empty["data"] == []
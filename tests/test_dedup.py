@@ -0,0 +1,32 @@
+from dedup import MinHashLSH, find_duplicates
+
+
+def report(report_id, name, group, url, powerbi_report_id=None):
+    return {"id": report_id, "name": name, "group": group, "url": url, "powerbi_report_id": powerbi_report_id}
+
+
+def test_clusters_similar_names_and_shared_urls():
+    found = find_duplicates([
+        report("1", "Análisis Comercial", "DIRECCION COMERCIAL", "https://app.powerbi.com/a"),
+        report("2", "Análisis Comercial comerciales", "COMERCIALES", "https://app.powerbi.com/b"),
+        report("3", "Stock", "COMPRAS", "https://app.powerbi.com/c", "r-1"),
+        report("4", "Inventario", "SUCURSALES", "https://app.powerbi.com/c?ctid=x", "r-1"),
+        report("5", "Recursos Humanos", "RECURSOS HUMANOS", "https://app.powerbi.com/e"),
+        report("6", "Bonus ARP Mensual 2024", "COMERCIALES", "HTTPS://APP.POWERBI.COM/F/"),
+        report("7", "Bonus ARP Mensual", "GERENCIA", "https://app.powerbi.com/f"),
+    ])
+
+    clusters = {tuple(r["id"] for r in cluster["reports"]): cluster["reasons"] for cluster in found["clusters"]}
+    assert clusters == {
+        ("1", "2"): ["similar_name"],
+        ("3", "4"): ["same_url"],
+        ("6", "7"): ["same_url", "similar_name"],
+    }
+    assert found["duplicate_reports"] == 6
+
+
+def test_signatures_estimate_jaccard():
+    lsh = MinHashLSH(bands=64, rows=4)
+    signatures = lsh.signatures(["ventas mensuales", "ventas mensuales", "recursos humanos"])
+    assert (signatures[0] == signatures[1]).all()
+    assert (signatures[0] == signatures[2]).mean() < 0.2
@@ -0,0 +1,26 @@
+import json
+from datetime import datetime
+
+from directory_snapshot import DirectorySnapshot
+
+
+def test_etag_only_changes_with_the_content():
+    reports = [
+        {"id": "r1", "name": "Ventas", "group": "COMPRAS", "updated_at": datetime(2024, 1, 1)},
+        {"id": "r2", "name": "Análisis", "group": "COMPRAS", "updated_at": datetime(2024, 1, 2)},
+    ]
+    snapshot = DirectorySnapshot(lambda: list(reports))
+    snapshot.build()
+    body, etag = snapshot.body, snapshot.etag
+    data = json.loads(body)["data"]
+    assert [report["id"] for report in data["groups"][0]["reports"]] == ["r2", "r1"]
+    assert "generated_at" in data
+
+    snapshot.build()
+    assert snapshot.builds == 2
+    assert (snapshot.body, snapshot.etag) == (body, etag)
+
+    reports[0] = {**reports[0], "name": "Ventas diarias"}
+    snapshot.build()
+    assert snapshot.etag != etag
+    assert json.loads(snapshot.body)["data"]["groups"][0]["reports"][1]["name"] == "Ventas diarias"
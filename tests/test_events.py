@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from events import EventHub
+
+
+def frames_until(stream, count):
+    async def collect():
+        frames = []
+        async for frame in stream:
+            frames.append(frame)
+            if len(frames) == count:
+                break
+        await stream.aclose()
+        return frames
+    return collect()
+
+
+def event_ids(frames):
+    return [int(frame.split(b"\n")[0][4:]) for frame in frames if frame.startswith(b"id: ")]
+
+
+def test_last_event_id_replays_missed_events():
+    hub = EventHub(history_size=3, horizon=10)
+    for i in range(5):
+        hub.publish(10 + i, "updated", {"id": f"r{i}", "name": "Análisis"})
+
+    async def main():
+        # retry frame, then events 12..14 from history, then one live event
+        stream = hub.stream(since=12)
+        task = asyncio.ensure_future(frames_until(stream, 5))
+        await asyncio.sleep(0.01)
+        hub.publish(15, "deleted", {"id": "r0"})
+        return await task
+
+    frames = asyncio.run(main())
+    assert frames[0] == b"retry: 5000\n\n"
+    assert event_ids(frames) == [12, 13, 14, 15]
+    assert json.loads(frames[1].split(b"data: ")[1]) == {"id": "r2", "name": "Análisis"}
+    assert frames[-1].startswith(b"id: 15\nevent: deleted\n")
+
+
+def test_gap_older_than_history_sends_reset():
+    hub = EventHub(history_size=3, horizon=10)
+    for i in range(5):
+        hub.publish(10 + i, "updated", {"id": f"r{i}"})
+    assert hub.horizon == 12
+
+    # Events 10 and 11 fell out of the ring, so no replay is possible
+    for since in (0, 11):
+        frames = asyncio.run(frames_until(hub.stream(since=since), 2))
+        assert frames[1] == b"event: reset\ndata: {}\n\n"
+    assert hub.metrics()["resets"] == 2
+    # Nothing was published before the hub's starting horizon either
+    frames = asyncio.run(frames_until(EventHub(horizon=10).stream(since=9), 2))
+    assert frames[1] == b"event: reset\ndata: {}\n\n"
+
+
+def test_same_key_is_published_once():
+    hub = EventHub()
+    assert hub.publish(7, "created", {"id": "r1"}, key=("r1", 7))
+    assert not hub.publish(7, "created", {"id": "r1"}, key=("r1", 7))
+    assert hub.publish(9, "updated", {"id": "r1"}, key=("r1", 9))
+    frames = asyncio.run(frames_until(hub.stream(since=0), 3))
+    assert event_ids(frames) == [7, 9]
+
+
+def test_writes_reach_subscribers_of_other_workers(monkeypatch, load_server):
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    database = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: database)
+    writer = load_server(EVENTS_POLL_SECONDS="0")
+    reader = load_server(EVENTS_POLL_SECONDS="0")
+
+    def poll(worker):
+        cursor, changes = worker.read_change_feed()
+        for action, report, changed_at in changes:
+            worker.publish_change(action, report, changed_at)
+        worker.event_feed_cursor = cursor
+
+    with TestClient(writer.app) as api:
+        created = api.post("/api/admin/reports", json={
+            "name": "Cobranza diaria", "group": "FINANZAS", "url": "https://app.powerbi.com/groups/me/reports/x",
+        }).json()["data"]
+        poll(reader)
+        api.put(f"/api/admin/reports/{created['id']}", json={"name": "Cobranza semanal"})
+        poll(reader)
+        api.delete(f"/api/admin/reports/{created['id']}")
+        poll(reader)
+        poll(writer)
+
+    streams = []
+    for worker in (reader, writer):
+        # The seed reports were written moments ago, so the feed has them too
+        stream = worker.event_hub.stream(since=worker.event_hub.horizon)
+        frames = asyncio.run(frames_until(stream, worker.event_hub.published + 1))
+        frames = [frame for frame in frames[1:] if created["id"].encode() in frame]
+        events = [(frame.split(b"\n")[1][7:].decode(), json.loads(frame.split(b"data: ")[1])) for frame in frames]
+        assert [event for event, _ in events] == ["created", "updated", "deleted"]
+        assert events[2][1] == {"id": created["id"], "name": "Cobranza semanal", "group": "FINANZAS"}
+        streams.append(event_ids(frames))
+    # The writer skipped its own writes when they came back from the poll,
+    # and both workers used the same sync tokens as ids
+    assert streams[0] == streams[1] == sorted(streams[0])
+
+
+def test_full_buffer_evicts_the_subscriber():
+    hub = EventHub(buffer_size=2)
+
+    async def main():
+        slow = hub.stream()
+        assert await slow.__anext__() == b"retry: 5000\n\n"
+        fast = asyncio.ensure_future(frames_until(hub.stream(), 4))
+        await asyncio.sleep(0.01)
+        # The slow subscriber never reads, so its third event overflows
+        for i in range(3):
+            hub.publish(i + 1, "created", {"id": f"r{i}"})
+            await asyncio.sleep(0.01)
+        rest = [frame async for frame in slow]
+        return rest, await fast
+
+    rest, fast = asyncio.run(main())
+    assert rest == [b"event: evicted\ndata: {}\n\n"]
+    assert event_ids(fast) == [1, 2, 3]
+    assert hub.metrics() == {"subscribers": 0, "published": 3, "evicted": 1, "resets": 0, "horizon": 0}
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from circuit_breaker import CircuitBreaker
+from last_good import LastKnownGood
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("mongo", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.record_success() is True
+    assert not breaker.is_open
+
+
+def test_last_good_survives_restart(tmp_path):
+    path = str(tmp_path / "last_good.snap")
+    now = datetime(2024, 5, 1, 12, 0)
+    reports = [
+        {"id": "a", "name": "Análisis Comercial", "group": "COMERCIALES", "url": "https://x/a",
+         "created_at": now, "updated_at": now},
+        {"id": "b", "name": "Compras", "group": "COMPRAS", "url": "https://x/b",
+         "created_at": now, "updated_at": now},
+    ]
+    assert LastKnownGood(path).store() is None
+    saver = LastKnownGood(path)
+    assert saver.save(reports) is True
+    assert saver.save(reports) is False
+
+    # A new process finds the file and answers from it
+    restarted = LastKnownGood(path)
+    store = restarted.store()
+    assert len(store) == 2
+    assert store.get("a")["name"] == "Análisis Comercial"
+    assert [report["id"] for report in store.find("COMPRAS")] == ["b"]
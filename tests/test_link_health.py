@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from link_health import LinkChecker, PowerBIApi, classify
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers like a report host: /ok, /gone, /redirect, /no-head, /slow"""
+
+    def do_HEAD(self):
+        self.server.seen.append((self.command, self.path, time.monotonic()))
+        if self.path == "/slow":
+            time.sleep(1)
+        status = {"/ok": 200, "/gone": 404, "/redirect": 302, "/no-head": 405, "/slow": 200}.get(self.path, 500)
+        self.send_response(status)
+        if status == 302:
+            self.send_header("Location", "/login")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.seen.append((self.command, self.path, time.monotonic()))
+        status = 200
+        if self.path.startswith("/v1.0/myorg/"):
+            # Power BI REST API: only the live report exists
+            if self.headers.get("Authorization") != "Bearer token-1":
+                status = 401
+            elif not self.path.endswith("/reports/live"):
+                status = 404
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        self.server.seen.append((self.command, self.path, time.monotonic()))
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b'{"access_token": "token-1", "expires_in": 3600}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_host():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.seen = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_classify():
+    assert classify(200) == "ok"
+    assert classify(302) == "unverified"
+    assert classify(404) == "broken"
+    assert classify(410) == "broken"
+    assert classify(500) == "error"
+
+
+def test_check_all_classifies_and_caches(stub_host):
+    server, base = stub_host
+    checker = LinkChecker(concurrency=4, per_host_rate=0, timeout=0.3)
+    urls = [f"{base}/ok", f"{base}/gone", f"{base}/redirect", f"{base}/no-head", f"{base}/slow", f"{base}/ok"]
+
+    results = asyncio.run(checker.check_all(urls))
+
+    assert results[f"{base}/ok"]["link_status"] == "ok"
+    assert results[f"{base}/gone"] == {**results[f"{base}/gone"], "link_status": "broken", "link_http_status": 404}
+    assert results[f"{base}/redirect"] == {**results[f"{base}/redirect"], "link_status": "unverified", "link_http_status": 302}
+    assert results[f"{base}/no-head"]["link_status"] == "ok"
+    assert ("GET", "/no-head") in [(method, path) for method, path, _ in server.seen]
+    assert results[f"{base}/slow"] == {**results[f"{base}/slow"], "link_status": "error", "link_http_status": None}
+    assert checker.requests == 5
+
+    # Everything but the timed-out URL comes from the cache
+    asyncio.run(checker.check_all(urls))
+    assert checker.requests == 6
+    assert checker.cache_hits == 4
+
+
+def test_requests_to_one_host_are_spaced(stub_host):
+    server, base = stub_host
+    checker = LinkChecker(concurrency=10, per_host_rate=20, timeout=2)
+
+    asyncio.run(checker.check_all(f"{base}/ok?n={n}" for n in range(5)))
+
+    started = sorted(at for _, _, at in server.seen)
+    assert len(started) == 5
+    assert started[-1] - started[0] >= 4 * 0.05 * 0.9
+
+
+def test_known_ids_are_checked_in_the_powerbi_api(stub_host):
+    server, base = stub_host
+    api = PowerBIApi("tenant", "client", "secret", api_base=f"{base}/v1.0/myorg", authority=base)
+    checker = LinkChecker(per_host_rate=0, timeout=2, powerbi=api)
+    reports = [
+        {"url": f"{base}/redirect", "workspace_id": "ws", "powerbi_report_id": "live"},
+        {"url": f"{base}/redirect", "workspace_id": "ws", "powerbi_report_id": "deleted"},
+        # A service principal cannot see "My workspace"; falls back to the URL
+        {"url": f"{base}/redirect", "workspace_id": "me", "powerbi_report_id": "mine"},
+    ]
+    targets = [checker.target(report) for report in reports]
+
+    results = asyncio.run(checker.check_all(targets))
+
+    assert [results[target]["link_status"] for target in targets] == ["ok", "broken", "unverified"]
+    assert [path for method, path, _ in server.seen if method == "POST"] == ["/tenant/oauth2/v2.0/token"]
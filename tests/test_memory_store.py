@@ -0,0 +1,137 @@
+import random
+import re
+from datetime import datetime, timedelta
+
+from memory_store import CompactReportStore
+from text_keys import name_key, name_tokens, search_filter
+
+GROUPS = ["COMPRAS", "GERENCIA", "RECURSOS HUMANOS"]
+WORDS = ["Ventas", "Cobranza", "Análisis", "Año", "Inventario", "Compras", "Nómina", "Región"]
+SEARCHES = [None, "ventas", "ANALISIS", "an", "nomina region", "año", "c++", "zzz"]
+
+
+def synthetic_reports(count, seed=5):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    reports = []
+    for i in range(count):
+        workspace = rng.choice([None, "ws-a", "ws-b"])
+        reports.append({
+            "id": f"r{i}",
+            "name": " ".join(rng.sample(WORDS, 2)) + f" {i}",
+            "group": rng.choice(GROUPS),
+            "url": f"https://app.powerbi.com/groups/{workspace or 'me'}/reports/r{i}",
+            "workspace_id": workspace,
+            "powerbi_report_id": f"r{i}",
+            "created_at": start + timedelta(minutes=i),
+            "updated_at": start + timedelta(minutes=2 * i),
+            "link_status": rng.choice([None, "ok", "broken"]),
+            "link_http_status": None,
+            "link_checked_at": None,
+        })
+    return reports
+
+
+def mongo_filter(group=None, search=None, workspace=None, link_status=None):
+    """The filter get_reports sends to Mongo"""
+    query = {}
+    query.update(search_filter(search) or {})
+    if workspace:
+        query["workspace_id"] = workspace
+    if link_status:
+        query["link_status"] = link_status
+    if group:
+        query["group"] = group
+    return query
+
+
+def matches(report, query):
+    tokens = name_tokens(report["name"])
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(any(re.search(word["name_tokens"]["$regex"], token) for token in tokens) for word in condition):
+                return False
+        elif field == "name_tokens":
+            # A search without words
+            return False
+        elif report.get(field) != condition:
+            return False
+    return True
+
+
+def assert_same_results(store, reports):
+    for group in [None, *GROUPS]:
+        for search in SEARCHES:
+            for workspace in [None, "ws-a"]:
+                for link_status in [None, "broken"]:
+                    query = mongo_filter(group, search, workspace, link_status)
+                    expected = [report for report in reports if matches(report, query)]
+                    assert store.find(group, search, workspace, link_status) == expected, query
+
+
+def test_find_matches_the_mongo_filter():
+    reports = synthetic_reports(300)
+    assert_same_results(CompactReportStore.build(reports), reports)
+
+
+def test_upsert_overwrites_in_place():
+    reports = synthetic_reports(20)
+    store = CompactReportStore.build(reports)
+    edited = {**reports[3], "name": "Nómina Región editado", "group": "GERENCIA", "link_status": "ok"}
+    store.upsert(edited)
+    added = {**reports[0], "id": "new", "name": "Inventario nuevo"}
+    store.upsert(added)
+    reports[3] = edited
+    reports.append(added)
+
+    assert len(store) == 21
+    assert store.get(edited["id"]) == edited
+    assert_same_results(store, reports)
+    assert {entry["_id"]: entry["count"] for entry in store.group_stats()} == {
+        group: sum(report["group"] == group for report in reports) for group in GROUPS
+        if any(report["group"] == group for report in reports)
+    }
+
+
+def test_remove_leaves_holes_and_compacted_copy_keeps_order():
+    reports = synthetic_reports(50)
+    store = CompactReportStore.build(reports)
+    assert not store.remove("missing")
+    removed = set()
+    for report in reports[::2] + reports[1:10:2]:
+        assert store.remove(report["id"])
+        removed.add(report["id"])
+    remaining = [report for report in reports if report["id"] not in removed]
+
+    # More holes than live rows: time for a compacted copy, but readers
+    # holding the original see its columns unchanged
+    assert store.needs_compaction()
+    assert len(store._ids) == len(reports)
+    compacted = store.compacted()
+    assert not compacted.needs_compaction()
+    assert len(compacted._ids) == len(compacted) == len(remaining)
+    for current in (store, compacted):
+        assert current.get(reports[0]["id"]) is None
+        assert_same_results(current, remaining)
+
+    compacted.upsert({**remaining[0], "group": "NUEVO"})
+    assert store.get(remaining[0]["id"])["group"] != "NUEVO"
+    assert "NUEVO" not in store.groups()
+
+
+def test_find_matches_real_mongo(mongo_replica_set):
+    from pymongo import MongoClient
+
+    reports = synthetic_reports(300)
+    collection = MongoClient(mongo_replica_set)["memory_store_test"]["reports"]
+    collection.drop()
+    collection.insert_many([
+        {**report, "name_key": name_key(report["name"]), "name_tokens": name_tokens(report["name"])}
+        for report in reports
+    ])
+    store = CompactReportStore.build(reports)
+    projection = {"_id": 0, "name_key": 0, "name_tokens": 0}
+    for group in [None, "COMPRAS"]:
+        for search in SEARCHES:
+            query = mongo_filter(group, search, "ws-a", None)
+            assert store.find(group, search, "ws-a") == list(collection.find(query, projection)), query
@@ -0,0 +1,53 @@
+import time
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from last_good import LastKnownGood
+
+from .conftest import _free_port
+
+REPORTS = [
+    {
+        "id": f"r{i}", "name": f"Informe {i}", "group": "ALTEC",
+        "url": f"https://app.powerbi.com/groups/me/reports/r{i}",
+        "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, i + 1),
+    }
+    for i in range(3)
+]
+
+
+def test_unreachable_mongo_opens_breaker_and_serves_last_good_within_deadline(tmp_path, load_server):
+    path = str(tmp_path / "last_good.snap")
+    assert LastKnownGood(path, min_interval=0).save(REPORTS)
+    # Nothing listens on this port, so every Mongo operation fails
+    server = load_server(
+        MONGO_URL=f"mongodb://127.0.0.1:{_free_port()}/",
+        MONGO_SELECTION_TIMEOUT_MS='200',
+        MONGO_BREAKER_FAILURES='2',
+        REQUEST_DEADLINE_SECONDS='5',
+        LAST_GOOD_PATH=path,
+    )
+
+    with TestClient(server.app) as api:
+        for _ in range(3):
+            start = time.monotonic()
+            response = api.get("/api/reports")
+            assert time.monotonic() - start < server.REQUEST_DEADLINE_SECONDS
+            assert response.status_code == 200
+            assert response.headers["X-Data-Stale"] == "true"
+            assert sorted(report["id"] for report in response.json()["data"]) == ["r0", "r1", "r2"]
+        assert server.mongo_breaker.metrics()["state"] == "open"
+
+
+def test_starts_without_mongo_or_last_good_copy(tmp_path, load_server):
+    server = load_server(
+        MONGO_URL=f"mongodb://127.0.0.1:{_free_port()}/",
+        MONGO_SELECTION_TIMEOUT_MS='200',
+        LAST_GOOD_PATH=str(tmp_path / "missing.snap"),
+    )
+
+    with TestClient(server.app) as api:
+        response = api.get("/api/reports")
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
@@ -0,0 +1,65 @@
+import asyncio
+import random
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from popularity import OpenCounter
+
+
+class FakeOpens:
+    """Just enough of a collection for OpenCounter; fails while `down`"""
+
+    def __init__(self):
+        self.counts = {}
+        self.down = False
+
+    def bulk_write(self, requests, ordered=True):
+        if self.down:
+            raise ServerSelectionTimeoutError("no servers")
+        for request in requests:
+            doc = request._doc["$inc"]
+            report_id = request._filter["id"]
+            self.counts[report_id] = self.counts.get(report_id, 0) + doc["count"]
+
+    def find(self, *args):
+        if self.down:
+            raise ServerSelectionTimeoutError("no servers")
+        return [{"id": report_id, "count": count} for report_id, count in self.counts.items()]
+
+
+def test_top_matches_a_full_sort():
+    rng = random.Random(3)
+    counter = OpenCounter(FakeOpens(), k=5)
+    ids = [f"r{i}" for i in range(40)]
+    for _ in range(2000):
+        # Skewed so the top set keeps changing hands; ties may go either way
+        counter.hit(rng.choice(ids[:rng.randint(1, len(ids))]))
+        expected = sorted(counter._totals.values(), reverse=True)[:5]
+        assert [count for _, count in counter.top(5)] == expected
+
+    counter.remove(counter.top(1)[0][0])
+    expected = sorted(counter._totals.values(), reverse=True)[:5]
+    assert [count for _, count in counter.top(5)] == expected
+
+
+def test_flush_survives_mongo_errors_and_keeps_increments():
+    opens = FakeOpens()
+    counter = OpenCounter(opens, flush_interval=0.01)
+    counter.hit("a")
+    counter.hit("a")
+
+    opens.down = True
+    assert counter.flush() is None
+    assert counter.metrics()["pending"] == 2
+
+    async def run_briefly():
+        task = asyncio.ensure_future(counter.run())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        opens.down = False
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run_briefly())
+    assert opens.counts == {"a": 2}
+    assert counter.top(1) == [("a", 2)]
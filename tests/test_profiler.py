@@ -0,0 +1,46 @@
+import threading
+import time
+
+from profiler import SamplingProfiler
+
+
+def busy_report_query(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sessions_write_collapsed_stacks(tmp_path):
+    profiler = SamplingProfiler(output_dir=str(tmp_path), interval=0.001)
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_report_query, args=(stop,), name="worker")
+    worker.start()
+    try:
+        window = profiler.start("window 1s")
+        request = profiler.start("GET /api/reports")
+        time.sleep(0.1)
+        request_path = profiler.stop(request)
+        time.sleep(0.05)
+        window_path = profiler.stop(window)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert window.samples > request.samples > 0
+    lines = open(window_path, encoding="utf-8").read().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any(line.startswith("worker;") and "busy_report_query (test_profiler.py:" in line for line in lines)
+    assert sorted(profiler.files()) == sorted(p.split("/")[-1] for p in (window_path, request_path))
+
+    # The sampler thread exits once no session is active
+    time.sleep(0.05)
+    assert profiler.metrics()["active"] == []
+    assert profiler._thread is None
+
+
+def test_sessions_in_the_same_second_get_their_own_files(tmp_path):
+    profiler = SamplingProfiler(output_dir=str(tmp_path), interval=0.001)
+    first, second = profiler.start("GET /api/reports"), profiler.start("GET /api/reports")
+    paths = {profiler.stop(first), profiler.stop(second)}
+    assert len(paths) == 2
+    assert len(profiler.files()) == 2
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import monitoring
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Remembers which server each command was sent to"""
+
+    def __init__(self):
+        self.events = []
+
+    def started(self, event):
+        self.events.append(event)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def addresses(self, command_name):
+        return {event.connection_id for event in self.events if event.command_name == command_name}
+
+
+def test_read_endpoints_use_secondaries_and_admin_uses_primary(mongo_replica_set, load_server):
+    recorder = CommandRecorder()
+    monitoring.register(recorder)
+    server = load_server(
+        MONGO_URL=mongo_replica_set,
+        MONGO_READ_PREFERENCE='secondary',
+        MONGO_MAX_STALENESS_SECONDS='90',
+        PRIMARY_READ_AFTER_WRITE_SECONDS='0',
+    )
+    primary = server.client.primary
+    secondaries = server.client.secondaries
+
+    with TestClient(server.app) as api:
+        recorder.events.clear()
+        assert api.get("/api/reports").status_code == 200
+        assert api.get("/api/groups").status_code == 200
+        assert recorder.addresses("find") <= secondaries
+        assert recorder.addresses("distinct") <= secondaries
+
+        recorder.events.clear()
+        created = api.post("/api/admin/reports", json={
+            "name": "Informe de replica",
+            "group": "ALTEC",
+            "url": "https://app.powerbi.com/groups/me/reports/replica",
+        })
+        assert created.status_code == 200
+        assert recorder.addresses("find") == {primary}
+        assert recorder.addresses("insert") == {primary}
+
+
+def test_recent_write_pins_reads_to_primary(mongo_replica_set, load_server):
+    recorder = CommandRecorder()
+    monitoring.register(recorder)
+    server = load_server(
+        MONGO_URL=mongo_replica_set,
+        MONGO_READ_PREFERENCE='secondary',
+        PRIMARY_READ_AFTER_WRITE_SECONDS='60',
+    )
+
+    with TestClient(server.app) as api:
+        created = api.post("/api/admin/reports", json={
+            "name": "Informe fijado",
+            "group": "ALTEC",
+            "url": "https://app.powerbi.com/groups/me/reports/pinned",
+        })
+        until = created.headers[server.READ_PRIMARY_HEADER]
+        recorder.events.clear()
+        assert api.get("/api/reports", headers={server.READ_PRIMARY_HEADER: until}).status_code == 200
+        assert recorder.addresses("find") == {server.client.primary}
+
+        # Other clients keep reading from the secondaries
+        recorder.events.clear()
+        assert api.get("/api/reports", params={"sort": "name"}).status_code == 200
+        assert recorder.addresses("find") <= server.client.secondaries
+
+
+def test_pin_is_per_client(monkeypatch, load_server):
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    # A secondary that never catches up with the primary
+    primary, lagging = mongomock.MongoClient(), mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: primary)
+    server = load_server(PRIMARY_READ_AFTER_WRITE_SECONDS='60')
+    secondary = lagging["powerbi_directory"]["reports"]
+    secondary.insert_many(server.reports_collection.find({}))
+    server.reports_read_collection = secondary
+
+    def names(response):
+        assert response.status_code == 200
+        return {report["name"] for report in response.json()["data"]}
+
+    with TestClient(server.app) as api:
+        created = api.post("/api/admin/reports", json={
+            "name": "Informe recién creado",
+            "group": "ALTEC",
+            "url": "https://app.powerbi.com/groups/me/reports/fresh",
+        })
+        until = created.headers[server.READ_PRIMARY_HEADER]
+        assert int(until) > time.time() * 1000
+        pinned = {server.READ_PRIMARY_HEADER: until}
+
+        assert "Informe recién creado" in names(api.get("/api/reports", headers=pinned))
+        assert "Informe recién creado" not in names(api.get("/api/reports"))
+        # Expired or implausibly far-off pins are ignored
+        for value in ["1", str(int(time.time() * 1000) + 10 ** 9), "x"]:
+            headers = {server.READ_PRIMARY_HEADER: value}
+            assert "Informe recién creado" not in names(api.get("/api/reports", headers=headers))
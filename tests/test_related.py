@@ -0,0 +1,30 @@
+from related import RelatedIndex
+
+REPORTS = [
+    {"id": "1", "name": "Análisis Comercial", "group": "DIRECCION COMERCIAL"},
+    {"id": "2", "name": "Análisis Comercial comerciales", "group": "COMERCIALES"},
+    {"id": "3", "name": "Stock Sucursales", "group": "SUCURSALES"},
+    {"id": "4", "name": "Análisis de Compras", "group": "COMPRAS"},
+    {"id": "5", "name": "Comercial Norte", "group": "DIRECCION COMERCIAL"},
+]
+
+
+def test_related_ranks_other_groups_by_similarity():
+    index = RelatedIndex.build(REPORTS)
+
+    ranked = index.related("1")
+    assert [report_id for report_id, _ in ranked] == ["2", "4"]
+    assert ranked[0][1] > ranked[1][1] > 0
+    assert "5" in [report_id for report_id, _ in index.related("1", other_groups=False)]
+    assert index.related("missing") == []
+
+
+def test_incremental_updates_match_the_directory():
+    index = RelatedIndex.build(REPORTS)
+
+    index.upsert({"id": "3", "name": "Análisis Comercial Sucursales", "group": "SUCURSALES"})
+    index.remove("2")
+
+    assert [report_id for report_id, _ in index.related("1")] == ["3", "4"]
+    assert "2" not in index
+    assert index.metrics()["dead_rows"] == 2
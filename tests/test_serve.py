@@ -0,0 +1,35 @@
+import sys
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def test_workers_share_one_database_setup(monkeypatch, load_server):
+    import pymongo
+    import uvicorn
+
+    # Every import of server (parent and workers) talks to the same database
+    database = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: database)
+    started = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **options: started.append(options["workers"]))
+    # serve.main exports these; registering them lets monkeypatch restore them
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+
+    server = load_server(DATABASE_PREPARED="1")
+    assert server.reports_collection.count_documents({}) == 0
+
+    sys.modules.pop("server", None)
+    sys.modules.pop("serve", None)
+    import serve
+
+    serve.main(["--workers", "3"])
+    assert started == [3]
+    seeded = server.reports_collection.count_documents({})
+    assert seeded == len(server.reports_data)
+
+    # Workers inherit DATABASE_PREPARED and do not insert another copy
+    for _ in range(3):
+        load_server()
+    assert server.reports_collection.count_documents({}) == seeded
@@ -0,0 +1,71 @@
+import io
+import os
+import threading
+
+import bson
+import pytest
+
+from snapshot import (
+    BENCH_INDEXES, SnapshotError, export_collection, read_blocks, read_header, restore_collection, write_snapshot,
+)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "reports.snap")
+    docs = [{"id": str(i), "name": f"Informe {i}", "group": "COMPRAS"} for i in range(12)]
+
+    assert write_snapshot(path, (bson.encode(doc) for doc in docs), {"collection": "reports"}, block_size=5) == 12
+
+    with open(path, "rb") as f:
+        header = read_header(f)
+        blocks = list(read_blocks(f))
+    assert header["collection"] == "reports"
+    assert [len(block) for block in blocks] == [5, 5, 2]
+    assert [dict(doc) for block in blocks for doc in block] == docs
+
+
+def test_concurrent_writers_never_publish_a_partial_file(tmp_path):
+    path = str(tmp_path / "reports.snap")
+    docs = [bson.encode({"id": str(i), "name": f"Informe {i}" * 20}) for i in range(3000)]
+    writers = [threading.Thread(target=write_snapshot, args=(path, docs), kwargs={"block_size": 100}) for _ in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    with open(path, "rb") as f:
+        read_header(f)
+        assert sum(len(block) for block in read_blocks(f)) == 3000
+    assert os.listdir(tmp_path) == ["reports.snap"]
+
+
+def test_snapshot_rejects_foreign_and_truncated_files(tmp_path):
+    with pytest.raises(SnapshotError):
+        read_header(io.BytesIO(b"not a snapshot"))
+
+    path = str(tmp_path / "reports.snap")
+    write_snapshot(path, [bson.encode({"id": "1"})])
+    with open(path, "rb") as f:
+        data = f.read()
+    truncated = io.BytesIO(data[:-12])
+    read_header(truncated)
+    with pytest.raises(SnapshotError):
+        list(read_blocks(truncated))
+
+
+def test_export_and_restore_against_mongo(mongo_replica_set, tmp_path):
+    from pymongo import MongoClient
+
+    collection = MongoClient(mongo_replica_set)["snapshot_test"]["reports"]
+    collection.drop()
+    docs = [{"id": str(i), "name": f"Informe {i}", "name_key": f"informe {i}", "group": "COMPRAS"} for i in range(2500)]
+    collection.insert_many([dict(doc) for doc in docs])
+    collection.create_indexes(BENCH_INDEXES)
+    path = str(tmp_path / "reports.snap")
+
+    assert export_collection(collection, path) == 2500
+    restored, _ = restore_collection(collection, path, drop=True, workers=2)
+
+    assert restored == 2500
+    assert list(collection.find({}, {"_id": 0}).sort("_id", 1)) == docs
+    assert set(collection.index_information()) == {"_id_", *(model.document["name"] for model in BENCH_INDEXES)}
@@ -0,0 +1,83 @@
+import asyncio
+import gzip
+
+from static_assets import IMMUTABLE, REVALIDATE, SpaStaticFiles, _choose_encoding
+
+BUNDLE = b"console.log('directorio');" * 100
+
+
+def call(app, path, headers=(), method="GET"):
+    """Run one request through the ASGI app; returns status, headers, body"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": path,
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+    }
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}, body
+
+
+def make_app(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "static" / "index.html").write_text("<div id=root></div>")
+    bundle = tmp_path / "static" / "js" / "main.4225530a.js"
+    bundle.write_bytes(BUNDLE)
+    (tmp_path / "static" / "js" / "main.4225530a.js.gz").write_bytes(gzip.compress(BUNDLE))
+    (tmp_path / "static" / "js" / "main.4225530a.js.br").write_bytes(b"brotli bytes")
+    return SpaStaticFiles(str(tmp_path / "static"))
+
+
+def test_cache_policy(tmp_path):
+    app = make_app(tmp_path)
+    status, headers, body = call(app, "/js/main.4225530a.js")
+    assert status == 200 and body == BUNDLE
+    assert headers["cache-control"] == IMMUTABLE
+    assert headers["vary"] == "Accept-Encoding"
+
+    assert call(app, "/js/missing.js")[0] == 404
+    status, headers, body = call(app, "/")
+    assert (status, body) == (200, b"<div id=root></div>")
+    assert headers["cache-control"] == REVALIDATE
+
+
+def test_if_none_match_gets_304_per_variant(tmp_path):
+    app = make_app(tmp_path)
+    _, plain, _ = call(app, "/js/main.4225530a.js")
+    _, zipped, _ = call(app, "/js/main.4225530a.js", [("Accept-Encoding", "gzip")])
+    assert plain["etag"] != zipped["etag"]
+
+    status, headers, body = call(app, "/js/main.4225530a.js", [("If-None-Match", plain["etag"])])
+    assert (status, body) == (304, b"")
+    assert headers["cache-control"] == IMMUTABLE
+    # The identity ETag does not validate the gzip variant
+    status, _, body = call(app, "/js/main.4225530a.js", [("Accept-Encoding", "gzip"), ("If-None-Match", plain["etag"])])
+    assert status == 200 and gzip.decompress(body) == BUNDLE
+
+
+def test_variant_follows_qvalues(tmp_path):
+    app = make_app(tmp_path)
+    status, headers, body = call(app, "/js/main.4225530a.js", [("Accept-Encoding", "gzip;q=0, deflate")])
+    assert status == 200 and "content-encoding" not in headers and body == BUNDLE
+    _, headers, body = call(app, "/js/main.4225530a.js", [("Accept-Encoding", "gzip, br")])
+    assert headers["content-encoding"] == "br" and body == b"brotli bytes"
+
+    variants = {"identity", "gzip", "br"}
+    assert _choose_encoding("", variants) == "identity"
+    assert _choose_encoding("gzip, deflate, br", variants) == "br"
+    assert _choose_encoding("br;q=0.5, gzip;q=0.8", variants) == "gzip"
+    assert _choose_encoding("br;q=0, gzip;q=0", variants) == "identity"
+    assert _choose_encoding("GZIP; Q=0.3", variants) == "gzip"
+    assert _choose_encoding("*", variants) == "br"
+    assert _choose_encoding("*;q=0.5, br;q=0", variants) == "gzip"
+    assert _choose_encoding("identity, gzip;q=0.5", variants) == "identity"
+    assert _choose_encoding("gzip;q=bogus", variants) == "identity"
+    assert _choose_encoding("br", {"identity", "gzip"}) == "identity"
@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def api(monkeypatch, load_server):
+    import pymongo
+
+    database = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: database)
+    server = load_server(SYNC_SAFETY_MS='0', EVENTS_POLL_SECONDS='0')
+    with TestClient(server.app) as client:
+        yield client
+
+
+def changes(api, since=None):
+    response = api.get("/api/reports/changes", params={"since": since} if since is not None else {})
+    assert response.status_code == 200
+    return response.json()["data"]
+
+
+def test_first_sync_is_a_reset_with_everything(api):
+    data = changes(api)
+    assert data["reset"] is True
+    assert data["deleted"] == []
+    assert len(data["reports"]) == len(api.get("/api/reports").json()["data"])
+    assert data["token"].isdigit()
+
+
+def test_delta_has_changed_reports_and_tombstones(api):
+    before = changes(api)
+    existing = before["reports"][0]
+    created = api.post("/api/admin/reports", json={
+        "name": "Cobranza diaria", "group": "FINANZAS", "url": "https://app.powerbi.com/groups/me/reports/x",
+    }).json()["data"]
+    api.put(f"/api/admin/reports/{created['id']}", json={"name": "Cobranza semanal"})
+    api.delete(f"/api/admin/reports/{existing['id']}")
+
+    data = changes(api, before["token"])
+    assert data["reset"] is False
+    assert [(report["id"], report["name"]) for report in data["reports"]] == [(created["id"], "Cobranza semanal")]
+    assert "name_key" not in data["reports"][0] and "name_tokens" not in data["reports"][0]
+    assert data["deleted"] == [existing["id"]]
+    assert int(data["token"]) >= int(before["token"])
+
+    # Nothing happened since the last token
+    later = changes(api, data["token"])
+    assert (later["reset"], later["reports"], later["deleted"]) == (False, [], [])
+
+
+def test_token_older_than_tombstones_resets(api):
+    data = changes(api, "0")
+    assert data["reset"] is True
+    assert data["deleted"] == []
+    assert data["reports"]
+
+
+@pytest.mark.parametrize("token", ["abc", "-5", "1.5", "99999999999999999999", "253402300800000"])
+def test_invalid_tokens_are_rejected(api, token):
+    response = api.get("/api/reports/changes", params={"since": token})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid sync token"
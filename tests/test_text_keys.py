@@ -0,0 +1,65 @@
+import re
+
+from text_keys import name_key, name_tokens, search_filter, search_words, spanish_sort_key
+
+
+def matches(search, name):
+    """Evaluate search_filter the way Mongo does against a stored report"""
+    tokens = name_tokens(name)
+    query = search_filter(search)
+    if "$and" not in query:
+        return any(token in query["name_tokens"]["$in"] for token in tokens)
+    return all(
+        any(re.search(condition["name_tokens"]["$regex"], token) for token in tokens)
+        for condition in query["$and"]
+    )
+
+
+def test_name_key_folds_accents_case_and_punctuation():
+    assert name_key("Análisis de Año-2024 (Ñandú)") == "analisis de ano 2024 nandu"
+    assert name_key("  Ventas   /  Región  ") == "ventas region"
+    assert name_key("¿?") == ""
+    assert name_tokens("Ventas y más ventas") == ["ventas", "y", "mas"]
+
+
+def test_search_matches_word_prefixes_in_any_order():
+    assert matches("ventas", "Informe de Ventas")
+    assert matches("VENT", "Informe de Ventas")
+    assert not matches("entas", "Informe de Ventas")
+    assert matches("region nómina", "Nómina por Región")
+    assert not matches("region compras", "Nómina por Región")
+    assert matches("ANALISIS", "Análisis")
+    assert matches("análisis", "Analisis")
+
+
+def test_search_cannot_inject_regex():
+    assert not matches(".*", "Informe de Ventas")
+    assert matches("c++", "C Compras")
+    assert matches("(ventas", "Ventas")
+    # Regex syntax only separates words, like any other punctuation
+    assert search_filter("a|b") == search_filter("a b")
+    assert search_filter("(?i)x") == search_filter("i x")
+    assert search_filter("[x") == search_filter("$x") == search_filter("x")
+
+
+def test_every_word_is_an_anchored_prefix():
+    # Anchored patterns are what let Mongo bound the multikey index scan
+    assert search_filter("Región nómina") == {"$and": [
+        {"name_tokens": {"$regex": "^region"}},
+        {"name_tokens": {"$regex": "^nomina"}},
+    ]}
+    assert search_words("ventas VENTAS") == ["ventas"]
+
+
+def test_empty_folded_search_matches_nothing():
+    assert search_filter(None) is None
+    assert search_filter("") is None
+    assert search_words("¿?") == []
+    for search in ["+", " ", "¿?", ".*"]:
+        assert not matches(search, "Informe de Ventas")
+        assert not matches(search, "")
+
+
+def test_spanish_sort_key_puts_enie_after_n():
+    names = ["Ñu", "nube", "Oso", "árbol", "Nube"]
+    assert sorted(names, key=spanish_sort_key) == ["árbol", "Nube", "nube", "Ñu", "Oso"]
@@ -0,0 +1,53 @@
+import threading
+from types import SimpleNamespace
+
+from tracing import RingBufferExporter, Tracer
+
+
+def command_event(name, collection):
+    return SimpleNamespace(
+        command_name=name, command={name: collection}, request_id=1, connection_id=("db", 27017),
+        database_name="powerbi_directory", duration_micros=1500,
+    )
+
+
+def test_spans_nest_and_include_mongo_commands():
+    exporter = RingBufferExporter()
+    tracer = Tracer(sample_rate=1.0, exporter=exporter)
+    root = tracer.start_trace("GET /api/reports")
+    with tracer.span("query"):
+        event = command_event("find", "reports")
+        tracer.command_listener.started(event)
+        tracer.command_listener.succeeded(event)
+    tracer.finish_trace(root, status=200)
+
+    [trace] = exporter.traces()
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert spans["query"]["parent_id"] == root.span_id
+    assert spans["mongo find"]["parent_id"] == spans["query"]["span_id"]
+    assert spans["mongo find"]["attributes"]["collection"] == "reports"
+    assert spans["mongo find"]["duration_ms"] == 1.5
+    assert exporter.traces(trace_id=trace["trace_id"]) == [trace]
+
+
+def test_unsampled_requests_record_nothing():
+    tracer = Tracer(sample_rate=0.0)
+    assert tracer.start_trace("GET /api/reports") is None
+    with tracer.span("query") as span:
+        assert span is None
+    event = command_event("find", "reports")
+    thread = threading.Thread(target=lambda: (tracer.command_listener.started(event),
+                                              tracer.command_listener.succeeded(event)))
+    thread.start()
+    thread.join()
+    assert tracer.exporter.traces() == []
+
+
+def test_sampled_parent_is_followed_only_while_tracing_is_on():
+    assert Tracer(sample_rate=0.0).start_trace("GET /api/reports", parent_sampled=True) is None
+    for tracer, trace_id in [(Tracer(sample_rate=0.0, follow_parent=True), None), (Tracer(sample_rate=1e-9), "a" * 32)]:
+        root = tracer.start_trace("GET /api/reports", trace_id, parent_sampled=True)
+        assert root is not None
+        tracer.finish_trace(root, status=200)
+        assert tracer.exporter.traces()[0]["trace_id"] == root.trace.trace_id
+    assert root.trace.trace_id == "a" * 32